@@ -1,18 +1,33 @@
 # admin_routes.py
-from flask import Blueprint, render_template, request, session, redirect, url_for, flash
+from flask import Blueprint, render_template, request, session, redirect, url_for, flash, jsonify, Response
 from utils import (
     load_questions,
-    save_json,
+    load_questions_for_edit,
+    save_questions,
     load_users,
     load_results,
     save_results,
     _migrate_one_question,
     _fix_type_to_capital,
+    course_file,
+    course_exists,
+    is_valid_course,
+    list_courses,
+    COURSES_DIR,
+    QUESTIONS_FILE,
+    USERS_FILE,
+    RESULTS_FILE,
 )
+from page_cache import cached_page
+from collusion import COLLUSION_FILE
+import gen_cache
+import exam_blueprints
+from results_export import WRITERS
+from regrading import start_regrade, get_job, recent_jobs, REGRADE_JOBS_DIR
 import re
 import json
 import os
-import google.generativeai as genai
+import random
 from dotenv import load_dotenv  # 👈 load from .env
 
 # -----------------------
@@ -22,12 +37,35 @@ load_dotenv()  # This reads .env file locally
 
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
-if not GEMINI_API_KEY:
-    # You will see this error if GEMINI_API_KEY is missing
-    raise RuntimeError("GEMINI_API_KEY not set in environment!")
+# AI features are simply switched off when no key is configured,
+# so the rest of the app (exams, dashboard) still boots.
+AI_ENABLED = bool(GEMINI_API_KEY)
+if not AI_ENABLED:
+    print("Warning: GEMINI_API_KEY not set -- AI question generation disabled.")
 
-# Configure Gemini once (global)
-genai.configure(api_key=GEMINI_API_KEY)
+GEMINI_MODEL = "models/gemini-2.5-flash"
+
+# ---- Lazy Gemini client (the SDK import is slow; only admins need it) ----
+_GENAI = None
+
+def _get_genai():
+    """
+    Import and configure google.generativeai on first use.
+    Returns the module, or None if AI is disabled or the SDK is unavailable.
+    """
+    global _GENAI
+    if _GENAI is not None:
+        return _GENAI
+    if not AI_ENABLED:
+        return None
+    try:
+        import google.generativeai as genai
+        genai.configure(api_key=GEMINI_API_KEY)
+    except Exception as e:
+        print("Gemini SDK not available:", e)
+        return None
+    _GENAI = genai
+    return _GENAI
 
 # Blueprint MUST be defined before any @admin_bp.route()
 admin_bp = Blueprint("admin", __name__, url_prefix="/admin")
@@ -60,6 +98,31 @@ def admin_logout():
     return redirect(url_for("auth.auth_page"))
 
 
+# =======================
+#  Course being administered
+# =======================
+def _course():
+    """Course the admin is working on (None = main bank)."""
+    course = session.get("admin_course")
+    return course if course_exists(course) else None
+
+
+@admin_bp.route("/course", methods=["POST"])
+def set_course():
+    if not session.get("admin"):
+        return redirect(url_for("admin.admin_login"))
+
+    course = (request.form.get("course") or "").strip() or None
+    if course and not is_valid_course(course):
+        flash("Course code: letters, digits, - and _ only!", "error")
+        return redirect(url_for("admin.admin_dashboard"))
+    if course and not course_exists(course):
+        course_file(QUESTIONS_FILE, course)   # creates courses/<course>/
+        flash(f"Course '{course}' created!", "success")
+    session["admin_course"] = course
+    return redirect(url_for("admin.admin_dashboard"))
+
+
 # =======================
 #  Admin dashboard / history
 # =======================
@@ -67,24 +130,80 @@ def admin_logout():
 def admin_dashboard():
     if not session.get("admin"):
         return redirect(url_for("admin.admin_login"))
-    return render_template(
-        "admin_dashboard.html",
-        questions=load_questions(),
-        users=load_users(),
-        results=load_results(),
-    )
+    course = _course()
+
+    def render():
+        return render_template(
+            "admin_dashboard.html",
+            course=course,
+            courses=list_courses(),
+            questions=load_questions(course),
+            users=load_users(course),
+            results=load_results(course),
+            regrade_jobs=recent_jobs(5, course),
+            blueprints=[
+                dict(bp, summary=exam_blueprints.describe_sections(bp["sections"]),
+                     pool=exam_blueprints.pool_status(name, course))
+                for name, bp in exam_blueprints.load_blueprints(course).items()
+            ],
+        )
+
+    # pending flash popups are part of the page -> render fresh
+    if session.get("_flashes"):
+        return render()
+    deps = [course_file(f, course) for f in (QUESTIONS_FILE, USERS_FILE, RESULTS_FILE,
+                                             exam_blueprints.EXAM_BLUEPRINTS_FILE,
+                                             exam_blueprints.PAPER_POOL_DIR)]
+    return cached_page(f"admin_dashboard:{course or ''}",
+                       deps + [REGRADE_JOBS_DIR, COURSES_DIR], render, course)
 
 
 @admin_bp.route("/user_history/<string:username>")
 def admin_user_history(username):
     if not session.get("admin"):
         return redirect(url_for("admin.admin_login"))
-    results = load_results()
-    history = results.get(username, {}).get("history")
-    if not history:
-        flash("No history found for this user!", "error")
-        return redirect(url_for("admin.admin_dashboard"))
-    return render_template("admin_user_history.html", username=username, history=history)
+
+    course = _course()
+
+    def render():
+        results = load_results(course)
+        history = results.get(username, {}).get("history")
+        if not history:
+            flash("No history found for this user!", "error")
+            return redirect(url_for("admin.admin_dashboard"))
+        from collusion import flags_for_user
+        return render_template("admin_user_history.html", username=username,
+                               history=history, flags=flags_for_user(username, course))
+
+    return cached_page(f"admin_history:{course or ''}:{username}",
+                       [course_file(RESULTS_FILE, course), course_file(COLLUSION_FILE, course)],
+                       render, course)
+
+
+# =======================
+#  Live proctor view
+# =======================
+@admin_bp.route("/proctor")
+def proctor_page():
+    if not session.get("admin"):
+        return redirect(url_for("admin.admin_login"))
+    return render_template("admin_proctor.html")
+
+
+@admin_bp.route("/proctor/snapshot")
+def proctor_snapshot():
+    if not session.get("admin"):
+        return jsonify({"error": "unauthorized"}), 401
+    import proctor
+    return jsonify(proctor.snapshot(_course()))
+
+
+@admin_bp.route("/grader_stats")
+def grader_stats():
+    if not session.get("admin"):
+        return jsonify({"error": "unauthorized"}), 401
+    import grader
+    return jsonify(grader.grader_stats())
 
 
 # =======================
@@ -103,7 +222,8 @@ def add_question():
         flash("Enter question!", "error")
         return redirect(url_for("admin.generate_questions_page"))
 
-    questions = load_questions()
+    course = _course()
+    questions = load_questions_for_edit(course)
 
     # DESCRIPTIVE
     if qtype == "DESCRIPTIVE":
@@ -147,7 +267,7 @@ def add_question():
             }
         )
 
-    save_json("questions.json", questions)
+    save_questions(questions, course)
     flash("Question added!", "success")
     return redirect(url_for("admin.generate_questions_page"))
 
@@ -157,10 +277,11 @@ def delete_question(index):
     if not session.get("admin"):
         return redirect(url_for("admin.admin_login"))
 
-    questions = load_questions()
+    course = _course()
+    questions = load_questions_for_edit(course)
     if 0 <= index < len(questions):
         questions.pop(index)
-        save_json("questions.json", questions)
+        save_questions(questions, course)
         flash("Question deleted!", "success")
     else:
         flash("Invalid question index!", "error")
@@ -168,6 +289,105 @@ def delete_question(index):
     return redirect(url_for("admin.admin_dashboard"))
 
 
+# =======================
+#  Results export (streamed)
+# =======================
+@admin_bp.route("/export/results.<string:fmt>")
+def export_results(fmt):
+    if not session.get("admin"):
+        return redirect(url_for("admin.admin_login"))
+    if fmt not in WRITERS:
+        flash("Export format must be csv or jsonl!", "error")
+        return redirect(url_for("admin.admin_dashboard"))
+
+    users = [u.strip() for u in (request.args.get("users") or "").split(",") if u.strip()]
+    chunks = WRITERS[fmt](
+        since=request.args.get("since") or None,
+        until=request.args.get("until") or None,
+        users=users or None,
+        exam=request.args.get("exam") or None,
+        course=_course(),
+    )
+    mimetype = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    return Response(chunks, mimetype=mimetype, headers={
+        "Content-Disposition": f"attachment; filename=results.{fmt}",
+        "Cache-Control": "no-store",
+    })
+
+
+# =======================
+#  Exam blueprints
+# =======================
+@admin_bp.route("/add_blueprint", methods=["POST"])
+def add_blueprint():
+    if not session.get("admin"):
+        return redirect(url_for("admin.admin_login"))
+
+    name = (request.form.get("name") or "").strip()
+    if not name:
+        flash("Enter exam name!", "error")
+        return redirect(url_for("admin.admin_dashboard"))
+    try:
+        sections = exam_blueprints.parse_sections(request.form.get("sections"))
+    except ValueError as e:
+        flash(f"Bad sections: {e}", "error")
+        return redirect(url_for("admin.admin_dashboard"))
+
+    starts_at = (request.form.get("starts_at") or "").replace("T", " ").strip()
+    try:
+        bp = {
+            "name": name,
+            "sections": sections,
+            "seed": int(request.form.get("seed") or random.randrange(1 << 30)),
+            "time_limit": float(request.form.get("time_limit") or 0) or None,
+            "pool_size": int(request.form.get("pool_size") or exam_blueprints.DEFAULT_POOL_SIZE),
+            "starts_at": starts_at or None,
+            "shuffle": True,
+        }
+    except ValueError:
+        flash("Seed, time limit and pool size must be numbers!", "error")
+        return redirect(url_for("admin.admin_dashboard"))
+    if starts_at and exam_blueprints.starts_at_ts(bp) is None:
+        flash("Start time must look like 2025-01-31 09:00!", "error")
+        return redirect(url_for("admin.admin_dashboard"))
+
+    course = _course()
+    blueprints = exam_blueprints.load_blueprints(course)
+    blueprints[name] = bp
+    exam_blueprints.save_blueprints(blueprints, course)
+    flash(f"Exam '{name}' saved!", "success")
+    return redirect(url_for("admin.admin_dashboard"))
+
+
+@admin_bp.route("/delete_blueprint/<string:name>")
+def delete_blueprint(name):
+    if not session.get("admin"):
+        return redirect(url_for("admin.admin_login"))
+
+    course = _course()
+    blueprints = exam_blueprints.load_blueprints(course)
+    if blueprints.pop(name, None) is not None:
+        exam_blueprints.save_blueprints(blueprints, course)
+        exam_blueprints.delete_pool(name, course)
+        flash("Exam deleted!", "success")
+    else:
+        flash("Unknown exam!", "error")
+    return redirect(url_for("admin.admin_dashboard"))
+
+
+@admin_bp.route("/build_pool/<string:name>")
+def build_pool(name):
+    if not session.get("admin"):
+        return redirect(url_for("admin.admin_login"))
+
+    try:
+        pool = exam_blueprints.build_pool(name, course=_course())
+        flash(f"Built {len(pool['papers'])} papers for '{name}'!", "success")
+    except KeyError:
+        flash("Unknown exam!", "error")
+    return redirect(url_for("admin.admin_dashboard"))
+
+
 # =======================
 #  Generate questions page
 # =======================
@@ -175,7 +395,8 @@ def delete_question(index):
 def generate_questions_page():
     if not session.get("admin"):
         return redirect(url_for("admin.admin_login"))
-    return render_template("generate_questions.html")
+    return render_template("generate_questions.html", ai_enabled=AI_ENABLED,
+                           cache_stats=gen_cache.cache_stats())
 
 
 # =======================
@@ -207,6 +428,27 @@ def api_generate():
         flash("Enter topic!", "error")
         return redirect(url_for("admin.generate_questions_page"))
 
+    # ----- Serve unused cached questions for this topic first -----
+    model_name = GEMINI_MODEL
+    cache_key = gen_cache.cache_key(model_name, qtype_req, topic)
+    seen = {_question_text_key(q.get("q")) for q in load_questions(_course())}
+    cached = _dedupe(gen_cache.take(cache_key, count), seen)
+    shortfall = count - len(cached)
+
+    if shortfall <= 0:
+        return _store_generated(cached, qtype_req, count, from_cache=len(cached))
+
+    genai = _get_genai()
+    if genai is None:
+        if cached:
+            flash(f"AI disabled; only {len(cached)} cached question(s) available.", "error")
+            return _store_generated(cached, qtype_req, count, from_cache=len(cached))
+        flash("AI generation is disabled (GEMINI_API_KEY not set)!", "error")
+        return redirect(url_for("admin.generate_questions_page"))
+
+    # Ask only for what the cache couldn't cover (+ a little prefetch)
+    ask = gen_cache.prefetch_count(shortfall)
+
     # ----- Prompt construction -----
     extra_note = (
         "Return EXACTLY a JSON array (even if count=1, still return [ { ... } ]).\n"
@@ -215,7 +457,7 @@ def api_generate():
 
     if qtype_req == "MCQ":
         prompt = f"""
-Generate {count} MCQs about "{topic}".
+Generate {ask} MCQs about "{topic}".
 {extra_note}
 Each item in the array must be an object like:
 {{
@@ -228,7 +470,7 @@ Each item in the array must be an object like:
 """
     else:
         prompt = f"""
-Generate {count} DESCRIPTIVE questions about "{topic}".
+Generate {ask} DESCRIPTIVE questions about "{topic}".
 {extra_note}
 Each item in the array must be an object like:
 {{
@@ -241,8 +483,7 @@ Each item in the array must be an object like:
 """
 
     try:
-        # Model already configured globally with GEMINI_API_KEY
-        model_name = "models/gemini-2.5-flash"
+        # Model configured lazily by _get_genai()
         model = genai.GenerativeModel(model_name)
         response = model.generate_content(prompt)
         raw = (getattr(response, "text", "") or "").strip()
@@ -306,23 +547,54 @@ Each item in the array must be an object like:
                 fixed["type"] = qtype_req
                 normalized.append(fixed)
 
-        if not normalized:
+        # Drop questions already in the bank (or served from cache)
+        normalized = _dedupe(normalized, seen)
+
+        if not normalized and not cached:
             flash("AI JSON parsed but no valid questions after migration!", "error")
             print("[api_generate] MIGRATION produced 0 items. Parsed data:", data_list)
             return redirect(url_for("admin.generate_questions_page"))
 
-        questions = load_questions()
-        questions.extend(normalized)
-        save_json("questions.json", questions)
-
-        flash(f"Added {len(normalized)} {qtype_req} question(s)!", "success")
-        return redirect(url_for("admin.generate_questions_page"))
+        # Keep the prefetched extras for the next request on this topic
+        gen_cache.put(cache_key, normalized[shortfall:])
+        generated = normalized[:shortfall]
+        return _store_generated(cached + generated, qtype_req, count,
+                                from_cache=len(cached), generated=len(generated))
 
     except Exception as e:
         print("AI ERROR:", e)
+        gen_cache.put(cache_key, cached)   # don't lose what we took from the cache
         flash("AI generation failed!", "error")
         return redirect(url_for("admin.generate_questions_page"))
 
+
+def _question_text_key(text) -> str:
+    return " ".join(str(text or "").lower().split())
+
+
+def _dedupe(items, seen):
+    """Items whose question text isn't in `seen` (which is updated in place)."""
+    out = []
+    for item in items:
+        k = _question_text_key(item.get("q"))
+        if k and k not in seen:
+            seen.add(k)
+            out.append(item)
+    return out
+
+
+def _store_generated(items, qtype_req, requested, from_cache=0, generated=0):
+    """Append generated/cached questions to the bank and record cache stats."""
+    gen_cache.record(requested, from_cache, generated)
+    if items:
+        course = _course()
+        questions = load_questions_for_edit(course)
+        questions.extend(items)
+        save_questions(questions, course)
+    note = f" ({from_cache} from cache)" if from_cache else ""
+    flash(f"Added {len(items)} {qtype_req} question(s){note}!", "success")
+    return redirect(url_for("admin.generate_questions_page"))
+
 # auth_routes.py
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session
 from werkzeug.security import generate_password_hash, check_password_hash
@@ -431,18 +703,46 @@ def edit_question(index):
     if not session.get("admin"):
         return redirect(url_for("admin.admin_login"))
 
-    questions = load_questions()
+    course = _course()
+    questions = load_questions_for_edit(course)
 
     if 0 <= index < len(questions):
-        questions[index]["level"] = request.form.get("level")
+        q = questions[index]
+        before = (q.get("correct"), q.get("answer_key"), q.get("max_marks"))
+        q["level"] = request.form.get("level")
 
-        if questions[index].get("type") == "DESCRIPTIVE":
+        if q.get("type") == "DESCRIPTIVE":
             try:
-                questions[index]["max_marks"] = int(request.form.get("max_marks", 5))
+                q["max_marks"] = int(request.form.get("max_marks", 5))
             except:
-                questions[index]["max_marks"] = 5
+                q["max_marks"] = 5
+            key = request.form.get("answer_key", "").strip()
+            if key:
+                if not key.lower().startswith("keywords:"):
+                    key = "keywords: " + key
+                q["answer_key"] = key
+        else:
+            correct = request.form.get("correct", "").strip()
+            if correct and correct in (q.get("a") or []):
+                q["correct"] = correct
+
+        save_questions(questions, course)
+
+        # 🔁 answer key / marks changed -> re-grade stored attempts in the background
+        if (q.get("correct"), q.get("answer_key"), q.get("max_marks")) != before:
+            job_id = start_regrade(q.to_dict(), course)
+            flash(f"Updated! Re-grading past attempts (job {job_id}).", "success")
+        else:
+            flash("Updated!", "success")
 
-        save_json("questions.json", questions)
-        flash("Updated!", "success")
+    return redirect(url_for("admin.admin_dashboard"))
 
-    return redirect(url_for("admin.admin_dashboard"))
\ No newline at end of file
+
+@admin_bp.route("/regrade/<string:job_id>")
+def regrade_status(job_id):
+    if not session.get("admin"):
+        return jsonify({"error": "unauthorized"}), 401
+    job = get_job(job_id)
+    if not job:
+        return jsonify({"error": "unknown job"}), 404
+    return jsonify(job)
\ No newline at end of file
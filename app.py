@@ -1,4 +1,3 @@
-# app.py
 import os
 import time
 from flask import Flask
@@ -15,6 +14,13 @@ def create_app():
     app.register_blueprint(exam_bp)
     app.register_blueprint(admin_bp)
 
+    # Fingerprinted static files (python build_assets.py) + asset_url() helper
+    from assets import init_assets
+    init_assets(app)
+
+    # SKIP_MIGRATE=1 -> don't touch the question bank at boot; it is loaded
+    # on first use instead (run `python migrate_questions.py` offline so that
+    # first load has nothing left to fix).
     if os.getenv("SKIP_MIGRATE") != "1":
         try:
             from utils import load_questions
@@ -22,16 +28,24 @@ def create_app():
         except Exception as e:
             print("Warning: load_questions() failed during startup:", e)
 
+    # Auto-submit timed-out exam attempts in the background
+    if os.getenv("EXAM_SWEEPER", "1") != "0":
+        from attempts import sweeper
+        sweeper.start()
+
     return app
 
 # 🔴 ADD THIS LINE (GLOBAL APP FOR GUNICORN)
-app = create_app()
+# (skipped in spawned worker processes, e.g. the re-grading pool: they
+# re-import this file as __mp_main__ and must not load the bank or start
+# another sweeper)
+if __name__ != "__mp_main__":
+    _t0 = time.time()
+    app = create_app()
+    STARTUP_SECONDS = time.time() - _t0
 
 if __name__ == "__main__":
-    t0 = time.time()
-    # we already created app above, so just use it
-    t1 = time.time()
-    print(f"[STARTUP] create_app() took {t1-t0:.3f}s")
+    print(f"[STARTUP] create_app() took {STARTUP_SECONDS:.3f}s")
 
     # Local dev server
     app.run(debug=True, use_reloader=False, host="127.0.0.1", port=5000)
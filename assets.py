@@ -0,0 +1,149 @@
+# assets.py
+"""
+Fingerprinted, precompressed static assets.
+
+Build (offline, before deploy):  python build_assets.py
+    static/<name>.<ext>  ->  static/dist/<name>.<hash>.<ext>
+                             (+ .gz / .br for text assets, re-encoded images)
+    static/dist/manifest.json maps logical names to fingerprinted files.
+
+Runtime: templates use asset_url('static', filename=...) exactly like
+url_for(). Files listed in the manifest are served from /assets/ with
+`Cache-Control: immutable` and the best precompressed variant the client
+accepts; anything not built yet falls back to the normal /static/ URL.
+"""
+import os
+import json
+import gzip
+import hashlib
+import mimetypes
+
+from flask import Blueprint, request, send_from_directory, url_for, abort
+
+STATIC_DIR = "static"
+DIST_DIR = os.path.join(STATIC_DIR, "dist")
+MANIFEST_FILE = os.path.join(DIST_DIR, "manifest.json")
+
+COMPRESSIBLE = (".css", ".js", ".svg", ".json", ".txt", ".html")
+# Images re-encoded as progressive JPEG at build time. login.jpg (actually a
+# 720x480 PNG) is stretched over the whole login page, so there is no smaller
+# width to cut it to -- the gain is the PNG -> JPEG re-encode only.
+REENCODE_IMAGES = ("login.jpg",)
+IMAGE_QUALITY = 82
+# Real format by magic bytes; the built file gets the matching extension so
+# it is served with the right Content-Type whatever the source is named.
+_IMAGE_MAGIC = ((b"\x89PNG\r\n\x1a\n", ".png"), (b"\xff\xd8\xff", ".jpg"),
+                (b"GIF8", ".gif"))
+ONE_YEAR = 365 * 24 * 3600
+
+assets_bp = Blueprint("assets", __name__, url_prefix="/assets")
+
+_MANIFEST = {}
+
+
+# ---- Build step ----
+def _reencode_image(data: bytes, name: str) -> bytes:
+    """Re-encode as JPEG if Pillow is installed (and it is smaller); else unchanged."""
+    if name not in REENCODE_IMAGES:
+        return data
+    try:
+        from io import BytesIO
+        from PIL import Image
+    except Exception:
+        print(f"[assets] Pillow not installed; {name} copied as is")
+        return data
+    img = Image.open(BytesIO(data))
+    out = BytesIO()
+    img.convert("RGB").save(out, "JPEG", quality=IMAGE_QUALITY, optimize=True, progressive=True)
+    return out.getvalue() if out.tell() < len(data) else data
+
+
+def build_assets(static_dir: str = STATIC_DIR, dist_dir: str = DIST_DIR) -> dict:
+    """Fingerprint + precompress everything in static/; returns the manifest."""
+    try:
+        import brotli
+    except Exception:
+        brotli = None
+        print("[assets] brotli not installed; writing gzip variants only")
+
+    os.makedirs(dist_dir, exist_ok=True)
+    manifest = {}
+    for name in sorted(os.listdir(static_dir)):
+        src = os.path.join(static_dir, name)
+        if not os.path.isfile(src):
+            continue
+        with open(src, "rb") as f:
+            data = f.read()
+        data = _reencode_image(data, name)
+
+        stem, ext = os.path.splitext(name)
+        for magic, real_ext in _IMAGE_MAGIC:
+            if data.startswith(magic):
+                ext = real_ext
+        digest = hashlib.sha256(data).hexdigest()[:10]
+        out_name = f"{stem}.{digest}{ext}"
+        with open(os.path.join(dist_dir, out_name), "wb") as f:
+            f.write(data)
+
+        encodings = []
+        if ext.lower() in COMPRESSIBLE:
+            with open(os.path.join(dist_dir, out_name + ".gz"), "wb") as f:
+                f.write(gzip.compress(data, compresslevel=9, mtime=0))
+            encodings.append("gzip")
+            if brotli is not None:
+                with open(os.path.join(dist_dir, out_name + ".br"), "wb") as f:
+                    f.write(brotli.compress(data, quality=11))
+                encodings.append("br")
+        manifest[name] = {"file": out_name, "encodings": encodings}
+
+    with open(os.path.join(dist_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+# ---- Runtime ----
+def load_manifest(path: str = MANIFEST_FILE) -> dict:
+    global _MANIFEST
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            _MANIFEST = json.load(f)
+    except Exception:
+        _MANIFEST = {}
+    return _MANIFEST
+
+
+def asset_url(endpoint: str, **values) -> str:
+    """url_for() drop-in: fingerprinted URL for built static files."""
+    if endpoint == "static":
+        entry = _MANIFEST.get(values.get("filename", ""))
+        if entry:
+            return url_for("assets.serve", filename=entry["file"])
+    return url_for(endpoint, **values)
+
+
+@assets_bp.route("/<path:filename>")
+def serve(filename):
+    if "/" in filename or filename == "manifest.json":
+        abort(404)
+    mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    accepted = request.accept_encodings
+    send_name, encoding = filename, None
+    for enc, suffix in (("br", ".br"), ("gzip", ".gz")):
+        if accepted[enc] and os.path.exists(os.path.join(DIST_DIR, filename + suffix)):
+            send_name, encoding = filename + suffix, enc
+            break
+
+    resp = send_from_directory(os.path.abspath(DIST_DIR), send_name,
+                               mimetype=mimetype, max_age=ONE_YEAR)
+    if encoding:
+        resp.headers["Content-Encoding"] = encoding
+    resp.headers["Vary"] = "Accept-Encoding"
+    resp.cache_control.public = True
+    resp.cache_control.immutable = True
+    return resp
+
+
+def init_assets(app):
+    load_manifest()
+    app.register_blueprint(assets_bp)
+    app.jinja_env.globals["asset_url"] = asset_url
@@ -0,0 +1,214 @@
+# attempts.py
+"""
+Server-side exam attempts with enforced deadlines.
+
+Each open attempt is one small file attempts/<id>.json (questions, answers,
+start_time, deadline), so recording an answer rewrites one attempt, not all
+of them. Attempts are closed by atomically renaming the file away (claim):
+whoever renames first -- the student's /result or the sweeper -- owns it, so
+an attempt is never finalized twice, even across gunicorn workers.
+
+The sweeper keeps a min-heap of (deadline, attempt_id); each tick pops only
+the expired entries (in batches) and finalizes them through grade_answers(),
+the same path /result uses.
+"""
+import os
+import time
+import heapq
+import uuid
+import threading
+
+from utils import (load_json, save_json, file_lock, grade_answers, append_history, format_duration,
+                   course_file)
+import proctor
+import grader
+import exam_blueprints
+
+ATTEMPTS_DIR = "attempts"
+EXAM_SETTINGS_FILE = "exam_settings.json"
+
+# Minutes; overridable per exam in [courses/<course>/]exam_settings.json:
+#   {"time_limits": {"MCQ": 10, "DESCRIPTIVE": 30, "MIX": 20}}
+DEFAULT_TIME_LIMIT_MIN = 10
+GRACE_SECONDS = 5          # network slack before an answer counts as late
+SWEEP_INTERVAL = 5         # seconds between sweeper ticks
+SWEEP_BATCH = 50           # max attempts finalized per tick
+
+
+# ---- Time limits ----
+def exam_time_limit(exam_key: str, course=None) -> int:
+    """Time limit in seconds for an exam type / blueprint name of `course`."""
+    settings = load_json(course_file(EXAM_SETTINGS_FILE, course))
+    limits = settings.get("time_limits", {}) if isinstance(settings, dict) else {}
+    try:
+        minutes = float(limits.get(exam_key, DEFAULT_TIME_LIMIT_MIN))
+    except Exception:
+        minutes = DEFAULT_TIME_LIMIT_MIN
+    return max(60, int(minutes * 60))
+
+
+# ---- Attempt files ----
+def _path(attempt_id: str) -> str:
+    return os.path.join(ATTEMPTS_DIR, f"{attempt_id}.json")
+
+def open_attempt(username: str, questions, time_limit: int, exam: str = "", course=None) -> dict:
+    os.makedirs(ATTEMPTS_DIR, exist_ok=True)
+    now = int(time.time())
+    attempt = {
+        "id": uuid.uuid4().hex,
+        "username": username,
+        "exam": exam,
+        "course": course,
+        "questions": questions,
+        "answers": {},
+        "start_time": now,
+        "deadline": now + int(time_limit),
+    }
+    save_json(_path(attempt["id"]), attempt)
+    sweeper.push(attempt["deadline"], attempt["id"])
+    return attempt
+
+def get_attempt(attempt_id: str):
+    if not attempt_id:
+        return None
+    data = load_json(_path(attempt_id))
+    return data or None
+
+def record_answer(attempt_id: str, index: int, answer: str) -> bool:
+    """Store one answer server-side. Returns False if the attempt is closed or expired."""
+    path = _path(attempt_id)
+    if not attempt_id or not os.path.exists(path):
+        return False
+    with file_lock(path):
+        attempt = get_attempt(attempt_id)
+        if not attempt or is_expired(attempt):
+            return False
+        attempt["answers"][str(index)] = answer
+        # claimed while we were grading it? don't write it back into the registry
+        if not os.path.exists(path):
+            return False
+        save_json(path, attempt)   # atomic (write + rename)
+    return True
+
+def is_expired(attempt: dict, now=None) -> bool:
+    now = time.time() if now is None else now
+    return now > attempt.get("deadline", float("inf")) + GRACE_SECONDS
+
+def claim_attempt(attempt_id: str):
+    """
+    Atomically take an open attempt out of the registry and return it.
+    None if someone else (another worker / the sweeper) already claimed it.
+    """
+    src = _path(attempt_id)
+    dst = f"{src}.{os.getpid()}.claimed"
+    with file_lock(src):       # never between record_answer's read and write
+        try:
+            os.rename(src, dst)
+        except OSError:
+            return None
+    data = load_json(dst)
+    for p in (dst, src + ".lock"):
+        try:
+            os.remove(p)
+        except OSError:
+            pass
+    return data or None
+
+
+# ---- Finalizing ----
+def finalize_attempt(attempt: dict, auto: bool = False) -> dict:
+    """Grade a claimed attempt and append it to results.json."""
+    graded = grade_answers(attempt["questions"], attempt.get("answers", {}))
+    end = min(time.time(), attempt["deadline"]) if auto else time.time()
+    entry = {
+        "score": graded["score"],
+        "total": graded["total"],
+        "time_taken": format_duration(end - attempt["start_time"]),
+        "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "exam": attempt.get("exam", ""),
+        "descriptive_reports": graded["descriptive_reports"],
+        "answers": graded["answers"],
+    }
+    if auto:
+        entry["auto_submitted"] = True
+    append_history(attempt["username"], entry, course=attempt.get("course"))
+    return entry
+
+
+class AttemptSweeper:
+    """Deadline-ordered auto-submit of expired attempts."""
+
+    def __init__(self, interval=SWEEP_INTERVAL, batch=SWEEP_BATCH):
+        self.interval = interval
+        self.batch = batch
+        self._heap = []
+        self._lock = threading.Lock()
+        self._thread = None
+        self.finalized = 0
+
+    def push(self, deadline: int, attempt_id: str):
+        with self._lock:
+            heapq.heappush(self._heap, (deadline, attempt_id))
+
+    def recover(self):
+        """Re-queue attempts left open by a previous process (one directory scan)."""
+        if not os.path.isdir(ATTEMPTS_DIR):
+            return 0
+        n = 0
+        for name in os.listdir(ATTEMPTS_DIR):
+            if not name.endswith(".json"):
+                continue
+            data = load_json(os.path.join(ATTEMPTS_DIR, name))
+            if data and "deadline" in data:
+                self.push(data["deadline"], data["id"])
+                n += 1
+        return n
+
+    def _pop_expired(self, now):
+        due = []
+        with self._lock:
+            while self._heap and len(due) < self.batch and now > self._heap[0][0] + GRACE_SECONDS:
+                due.append(heapq.heappop(self._heap)[1])
+        return due
+
+    def tick(self, now=None) -> int:
+        """Finalize up to one batch of expired attempts. Returns how many."""
+        now = time.time() if now is None else now
+        done = 0
+        for attempt_id in self._pop_expired(now):
+            attempt = claim_attempt(attempt_id)
+            if attempt is None:
+                continue   # submitted by the student or handled elsewhere
+            proctor.close(attempt_id)
+            try:
+                finalize_attempt(attempt, auto=True)
+                done += 1
+            except Exception as e:
+                print(f"[sweeper] failed to finalize {attempt_id}:", e)
+        self.finalized += done
+        return done
+
+    def _run(self):
+        while True:
+            try:
+                # keep draining while whole batches are due
+                while self.tick() >= self.batch:
+                    pass
+                proctor.flush()
+                grader.flush_stats()
+                exam_blueprints.prebuild_due()
+            except Exception as e:
+                print("[sweeper] tick failed:", e)
+            time.sleep(self.interval)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        recovered = self.recover()
+        if recovered:
+            print(f"[sweeper] re-queued {recovered} open attempt(s)")
+        self._thread = threading.Thread(target=self._run, name="attempt-sweeper", daemon=True)
+        self._thread.start()
+
+
+sweeper = AttemptSweeper()
@@ -1,7 +1,8 @@
 # auth_routes.py
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session
 from werkzeug.security import generate_password_hash, check_password_hash
-from utils import is_valid_username, password_has_spaces, load_users, save_users
+from utils import is_valid_username, password_has_spaces, load_users, save_users, course_exists
+from exam_blueprints import load_blueprints, describe_sections
 import random, time, os
 import sys
 
@@ -33,13 +34,19 @@ def signup():
         flash("Email required!", "error")
         return redirect(url_for('auth.auth_page') + "#register")
 
-    users = load_users()
+    # 🏫 each course has its own user list (blank = main)
+    course = (request.form.get("course") or "").strip() or None
+    if not course_exists(course):
+        flash("Unknown course code!", "error")
+        return redirect(url_for('auth.auth_page') + "#register")
+
+    users = load_users(course)
     if username in users:
         flash("Username already exists! Please login.", "error")
         return redirect(url_for('auth.auth_page'))
 
     users[username] = {"email": email, "pw_hash": generate_password_hash(password_raw)}
-    save_users(users)
+    save_users(users, course)
     flash("Registration successful! Please login.", "success")
     return redirect(url_for('auth.auth_page'))
 
@@ -56,7 +63,12 @@ def login():
         flash("Password cannot contain spaces.", "error")
         return redirect(url_for("auth.auth_page"))
 
-    users = load_users()
+    course = (request.form.get("course") or "").strip() or None
+    if not course_exists(course):
+        flash("Unknown course code!", "error")
+        return redirect(url_for("auth.auth_page"))
+
+    users = load_users(course)
     if username not in users:
         flash("User not found! Please register.", "error")
         return redirect(url_for("auth.auth_page") + "#register")
@@ -73,7 +85,7 @@ def login():
         # import here so load_questions runs only when needed
         from utils import load_questions
         start = time.time()
-        qs = load_questions() or []
+        qs = load_questions(course) or []
         took = time.time() - start
         # debug log - prints to server console so you can see if load was heavy
         print(f"[auth.login] load_questions() returned {len(qs)} items in {took:.3f}s", file=sys.stderr)
@@ -83,6 +95,7 @@ def login():
         qs = []
 
     session["username"] = username
+    session["course"] = course
     session["questions"] = []   # keep empty
     session["index"] = 0
     session["answers"] = {}
@@ -99,5 +112,8 @@ def logout_final():
 def choose_exam():
     if "username" not in session:
         return redirect(url_for("auth.auth_page"))
-    return render_template("choose_exam.html")
+    return render_template("choose_exam.html", course=session.get("course"), exams=[
+        dict(bp, summary=describe_sections(bp["sections"]))
+        for bp in load_blueprints(session.get("course")).values()
+    ])
 
@@ -0,0 +1,88 @@
+# bench_similarity.py
+"""
+Compare similarity backends on this machine's CPU.
+
+    SIM_MODEL_PATH=/models/minilm python bench_similarity.py [torch torch-int8 onnx]
+
+For every backend that loads, reports model load time, single-request
+latency (one answer vs its key, what /result does), batched throughput,
+and agreement with the first backend (mean |delta cosine| and how often the
+Excellent/Good/Fair/Weak grade is the same).
+"""
+import sys
+import time
+import random
+import statistics
+
+from utils import load_questions, _normalize_answer_key_text
+from similarity import load_backend, cosine, BACKENDS
+from grader import grade_band
+
+
+def sample_pairs(n=200, seed=7):
+    """(answer, key) pairs from the descriptive bank: full / partial / unrelated answers."""
+    keys = [_normalize_answer_key_text(q.answer_key) for q in load_questions()
+            if q.type == "DESCRIPTIVE" and q.answer_key]
+    if not keys:
+        keys = ["solar wind charged particles magnetic field polar regions"]
+    rng = random.Random(seed)
+    pairs = []
+    for _ in range(n):
+        key = rng.choice(keys)
+        words = key.split()
+        kind = rng.random()
+        if kind < 0.33:
+            ans = key
+        elif kind < 0.66:
+            ans = " ".join(rng.sample(words, max(1, len(words) // 2)))
+        else:
+            ans = rng.choice(keys)
+        pairs.append((ans, key))
+    return pairs
+
+
+def bench(name, pairs):
+    t0 = time.perf_counter()
+    backend = load_backend(name)
+    load_s = time.perf_counter() - t0
+
+    backend.encode(["warm up", "warm up"])
+    lat = []
+    scores = []
+    for ans, key in pairs:
+        t = time.perf_counter()
+        a, k = backend.encode([ans, key])
+        lat.append(time.perf_counter() - t)
+        scores.append(max(0.0, min(1.0, cosine(a, k))))
+
+    texts = [t for pair in pairs for t in pair]
+    t = time.perf_counter()
+    backend.encode(texts)
+    batch_s = time.perf_counter() - t
+    return {
+        "load_s": load_s,
+        "p50_ms": statistics.median(lat) * 1000,
+        "p95_ms": sorted(lat)[int(len(lat) * 0.95) - 1] * 1000,
+        "texts_per_s": len(texts) / batch_s,
+        "scores": scores,
+    }
+
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(BACKENDS)
+    pairs = sample_pairs()
+    baseline = None
+    print(f"{len(pairs)} answer/key pairs\n")
+    print(f"{'backend':11s} {'load':>7s} {'p50':>8s} {'p95':>8s} {'texts/s':>9s} {'|dcos|':>8s} {'grade=':>7s}")
+    for name in names:
+        try:
+            r = bench(name, pairs)
+        except Exception as e:
+            print(f"{name:11s} unavailable: {e}")
+            continue
+        if baseline is None:
+            baseline = r["scores"]
+        diffs = [abs(a - b) for a, b in zip(r["scores"], baseline)]
+        same = sum(grade_band(a) == grade_band(b) for a, b in zip(r["scores"], baseline))
+        print(f"{name:11s} {r['load_s']:6.2f}s {r['p50_ms']:7.2f}ms {r['p95_ms']:7.2f}ms "
+              f"{r['texts_per_s']:9.1f} {statistics.mean(diffs):8.4f} {same/len(pairs):6.1%}")
@@ -0,0 +1,33 @@
+# bench_startup.py
+"""
+Cold-boot benchmark: imports app.py in fresh interpreters and reports how
+long `import app` (i.e. create_app()) takes in each startup mode.
+
+    python bench_startup.py [runs]
+"""
+import os
+import subprocess
+import sys
+import statistics
+
+SNIPPET = "import time; t=time.perf_counter(); import app; print(time.perf_counter()-t)"
+
+MODES = {
+    "default": {},
+    "lazy": {"SKIP_MIGRATE": "1"},
+}
+
+def run(mode_env, runs):
+    env = dict(os.environ, **mode_env)
+    times = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", SNIPPET], env=env,
+                             capture_output=True, text=True, check=True)
+        times.append(float(out.stdout.strip().splitlines()[-1]))
+    return times
+
+if __name__ == "__main__":
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    for name, env in MODES.items():
+        t = run(env, runs)
+        print(f"{name:8s} min={min(t)*1000:8.1f}ms  median={statistics.median(t)*1000:8.1f}ms  (n={runs})")
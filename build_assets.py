@@ -0,0 +1,18 @@
+# build_assets.py
+"""
+Build fingerprinted + precompressed static assets into static/dist/.
+
+    python build_assets.py
+
+Optional: `pip install brotli pillow` for .br variants and JPEG re-encoding of images.
+"""
+import time
+from assets import build_assets
+
+if __name__ == "__main__":
+    t0 = time.time()
+    manifest = build_assets()
+    for name, entry in manifest.items():
+        enc = ", ".join(entry["encodings"]) or "-"
+        print(f"[assets] {name:28s} -> {entry['file']:36s} ({enc})")
+    print(f"[assets] {len(manifest)} file(s) in {time.time()-t0:.2f}s")
@@ -0,0 +1,29 @@
+# build_paper_pool.py
+"""
+Pre-assemble exam papers ahead of a scheduled start.
+
+    python build_paper_pool.py                 # every exam blueprint
+    python build_paper_pool.py Midterm --size 500
+    python build_paper_pool.py --list
+    python build_paper_pool.py --course CS101
+"""
+import argparse
+from exam_blueprints import load_blueprints, build_pool, pool_status, describe_sections
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("names", nargs="*")
+    ap.add_argument("--size", type=int, default=None, help="papers per exam (default: pool_size)")
+    ap.add_argument("--list", action="store_true")
+    ap.add_argument("--course", help="course partition (default: the main bank)")
+    args = ap.parse_args()
+
+    blueprints = load_blueprints(args.course)
+    if args.list:
+        for name, bp in blueprints.items():
+            st = pool_status(name, args.course)
+            print(f"{name}: {describe_sections(bp['sections'])} | pool {st['used']}/{st['size']}"
+                  f"{'' if st['fresh'] else ' (stale)'}")
+    else:
+        for name in args.names or list(blueprints):
+            build_pool(name, args.size, args.course)
@@ -0,0 +1,191 @@
+# collusion.py
+"""
+Cross-submission near-duplicate detection for descriptive answers.
+
+For every descriptive question answered in an exam window, each answer is
+turned into word 3-gram shingles, summarised by a MinHash signature and
+bucketed with LSH (BANDS x ROWS). Identical answers are collapsed first,
+and answers that share a bucket are compared exactly (Jaccard on shingles)
+against one representative per group already found in that bucket, so the
+work is ~O(n) per question even when thousands of students hand in the same
+boilerplate. Answers linked at or above FLAG_THRESHOLD form a group; each
+group spanning two or more students is written once to collusion_flags.json
+and shown in the admin history view.
+
+Runs offline over results.json (answers are stored with each attempt):
+    python detect_collusion.py --since "2025-11-01" --until "2025-11-30"
+"""
+import re
+import time
+import zlib
+import random
+from collections import defaultdict
+
+from utils import load_results, load_json, save_json, course_file
+
+COLLUSION_FILE = "collusion_flags.json"
+
+SHINGLE_SIZE = 3
+NUM_PERM = 64
+BANDS = 16               # 16 bands x 4 rows -> candidate threshold ~0.5
+ROWS = NUM_PERM // BANDS
+FLAG_THRESHOLD = 0.6     # Jaccard similarity to flag a pair
+MIN_SHINGLES = 3         # too-short answers carry no signal
+
+_PRIME = (1 << 31) - 1
+_rng = random.Random(1234)   # fixed seed: signatures comparable across runs
+_PERMS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def shingles(text: str) -> set:
+    words = _WORD.findall((text or "").lower())
+    if len(words) < SHINGLE_SIZE:
+        return {zlib.crc32(" ".join(words).encode())} if words else set()
+    return {zlib.crc32(" ".join(words[i:i + SHINGLE_SIZE]).encode())
+            for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def _minhash_py(hashes) -> tuple:
+    return tuple(min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMS)
+
+
+def _minhash_factory():
+    """Vectorised MinHash when numpy is installed, else pure Python."""
+    try:
+        import numpy as np
+    except Exception:
+        return _minhash_py
+    a = np.array([p[0] for p in _PERMS], dtype=np.uint64)[:, None]
+    b = np.array([p[1] for p in _PERMS], dtype=np.uint64)[:, None]
+
+    def _minhash_np(hashes):
+        h = np.fromiter(hashes, dtype=np.uint64)[None, :]
+        return tuple(((a * h + b) % _PRIME).min(axis=1).tolist())
+    return _minhash_np
+
+
+_minhash = _minhash_factory()
+
+
+def jaccard(x: set, y: set) -> float:
+    if not x or not y:
+        return 0.0
+    return len(x & y) / len(x | y)
+
+
+def near_duplicates(items, threshold=FLAG_THRESHOLD):
+    """
+    items: list of (ref, text) for ONE question.
+    Returns [(refs, jaccard)]: groups of 2+ refs whose answers are linked by
+    similarities at/above `threshold` (jaccard = the weakest such link).
+    """
+    # identical answers -> one shingle set with all their refs
+    ids, sets, refs = {}, [], []
+    for ref, text in items:
+        sh = frozenset(shingles(text))
+        if len(sh) < MIN_SHINGLES:
+            continue
+        if sh not in ids:
+            ids[sh] = len(sets)
+            sets.append(sh)
+            refs.append([])
+        refs[ids[sh]].append(ref)
+
+    parent = list(range(len(sets)))
+    weakest = [1.0] * len(sets)
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    buckets = defaultdict(list)
+    for u, sh in enumerate(sets):
+        sig = _minhash(sh)
+        for band in range(BANDS):
+            buckets[(band, sig[band * ROWS:(band + 1) * ROWS])].append(u)
+
+    for members in buckets.values():
+        if len(members) < 2:
+            continue
+        reps = []             # one member per group seen in this bucket
+        for m in members:
+            for r in reps:
+                rm, rr = find(m), find(r)
+                if rm == rr:
+                    break
+                score = jaccard(sets[m], sets[r])
+                if score >= threshold:
+                    parent[rm] = rr
+                    weakest[rr] = min(weakest[rr], weakest[rm], score)
+                    break
+            else:
+                reps.append(m)
+
+    groups = defaultdict(list)
+    for u in range(len(sets)):
+        groups[find(u)].extend(refs[u])
+    return [(members, round(weakest[root], 3))
+            for root, members in groups.items() if len(members) > 1]
+
+
+def collect_answers(results, since=None, until=None):
+    """Group stored descriptive answers by question for attempts in [since, until]."""
+    if until and len(until) == 10:
+        until += " 23:59:59"      # date-only upper bound includes that day
+    by_question = defaultdict(list)
+    for username, info in results.items():
+        for entry in info.get("history", []):
+            date = entry.get("date", "")
+            if (since and date < since) or (until and date > until):
+                continue
+            reports = entry.get("descriptive_reports") or []
+            stored = [a for a in entry.get("answers") or [] if a.get("type") == "DESCRIPTIVE"]
+            # per-question answers line up with the descriptive reports
+            texts = [a.get("answer") for a in stored] if stored else [r.get("answer") for r in reports]
+            for rep, ans in zip(reports, texts):
+                if ans:
+                    by_question[rep["q"]].append(((username, date), ans))
+    return by_question
+
+
+def detect_collusion(since=None, until=None, threshold=FLAG_THRESHOLD, course=None) -> dict:
+    """Run one exam window and merge its flags into the course's collusion_flags.json."""
+    t0 = time.time()
+    by_question = collect_answers(load_results(course), since, until)
+    flags = []
+    answers = 0
+    for q, items in by_question.items():
+        answers += len(items)
+        for members, score in near_duplicates(items, threshold):
+            if len({user for user, _ in members}) < 2:
+                continue      # one student resubmitting their own answer
+            flags.append({"q": q, "members": [list(m) for m in members], "jaccard": score})
+
+    window = f"{since or '*'} .. {until or '*'}"
+    flags_file = course_file(COLLUSION_FILE, course)
+    store = load_json(flags_file) or {}
+    store[window] = {"run_at": time.strftime("%Y-%m-%d %H:%M:%S"), "flags": flags}
+    save_json(flags_file, store)
+    return {"window": window, "questions": len(by_question), "answers": answers,
+            "flags": len(flags), "seconds": round(time.time() - t0, 3)}
+
+
+def flags_for_user(username: str, course=None) -> list:
+    """
+    All stored flags involving `username` (for the admin history page), with
+    `dates` (their attempts) and `others` ([user, date] of everyone else).
+    """
+    out = []
+    for window, run in (load_json(course_file(COLLUSION_FILE, course)) or {}).items():
+        for f in run.get("flags", []):
+            members = f.get("members")
+            if members is None:       # pair flags from before grouping
+                members = [[f["user_a"], f["date_a"]], [f["user_b"], f["date_b"]]]
+            dates = [d for u, d in members if u == username]
+            if dates:
+                out.append({"q": f["q"], "jaccard": f["jaccard"], "window": window, "dates": dates,
+                            "others": [[u, d] for u, d in members if u != username]})
+    return out
@@ -0,0 +1,20 @@
+# detect_collusion.py
+"""
+Flag near-duplicate descriptive answers between students for one exam window.
+
+    python detect_collusion.py [--since "YYYY-MM-DD[ HH:MM:SS]"] [--until ...] [--threshold 0.6] [--course CS101]
+"""
+import argparse
+from collusion import detect_collusion, FLAG_THRESHOLD
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--since")
+    ap.add_argument("--until")
+    ap.add_argument("--threshold", type=float, default=FLAG_THRESHOLD)
+    ap.add_argument("--course", help="course partition (default: the main bank)")
+    args = ap.parse_args()
+    report = detect_collusion(args.since, args.until, args.threshold, args.course)
+    print(f"[collusion] window {report['window']}: {report['answers']} answers over "
+          f"{report['questions']} question(s) -> {report['flags']} flagged group(s) "
+          f"in {report['seconds']}s")
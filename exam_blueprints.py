@@ -0,0 +1,297 @@
+# exam_blueprints.py
+"""
+Admin-defined exams ("Midterm: 10 Easy MCQ + 5 Medium MCQ + 2 Descriptive")
+and a precomputed pool of papers for each.
+
+A blueprint is a list of sections (count, type, level) plus a seed. Paper k
+of a blueprint is a pure function of (seed, k, question bank): each section
+is sampled with random.Random(f"{seed}:{k}") from its stratum, without
+repeating a question across sections, then optionally shuffled. Every
+student therefore gets their own variant, and any paper can be reproduced
+later from its number.
+
+build_pool() assembles the next pool_size papers (from the current paper
+counter on) ahead of time into [courses/<course>/]paper_pool/<name>.json,
+as question ids plus the bank fingerprint they were built against. At exam
+start next_paper() only bumps a locked counter and looks the pooled ids up
+in the bank -- no filtering or sampling per student. Ids survive a worker
+whose cached bank is older than the pool (it re-reads the bank instead of
+indexing into the wrong list). Papers outside the pool, or a pool built
+against an older bank, fall back to assembling paper k on the spot (same
+result, just slower).
+
+Blueprints and pools belong to a course (course=None = the default bank).
+Pools for blueprints with a starts_at time are built automatically by the
+attempt sweeper PREBUILD_AHEAD seconds before the start; build_paper_pool.py
+and the admin dashboard build them on demand.
+"""
+import os
+import re
+import time
+import random
+import threading
+
+from utils import (load_json, save_json, file_lock, load_questions, filter_question_ids,
+                   reload_questions_from_disk, question_id, course_file, list_courses,
+                   _source_fingerprint, QUESTIONS_FILE)
+
+EXAM_BLUEPRINTS_FILE = "exam_blueprints.json"
+PAPER_POOL_DIR = "paper_pool"
+DEFAULT_POOL_SIZE = 200
+PREBUILD_AHEAD = 15 * 60       # seconds before starts_at
+PREBUILD_CHECK = 60            # seconds between sweeper checks
+
+_TYPES = ("MCQ", "DESCRIPTIVE")
+_LEVELS = ("Easy", "Medium", "Hard")
+
+_POOLS = {}                    # pool path -> (mtime_ns, pool) for this worker
+_POOLS_LOCK = threading.Lock()
+_QID_INDEX = {}                # course -> {question id: bank index} for this worker
+_LAST_PREBUILD_CHECK = 0.0
+
+
+# ---- Blueprints ----
+def load_blueprints(course=None) -> dict:
+    data = load_json(course_file(EXAM_BLUEPRINTS_FILE, course))
+    return data if isinstance(data, dict) else {}
+
+def save_blueprints(blueprints: dict, course=None):
+    save_json(course_file(EXAM_BLUEPRINTS_FILE, course), blueprints)
+
+def get_blueprint(name: str, course=None):
+    return load_blueprints(course).get(name)
+
+def parse_sections(text: str) -> list:
+    """
+    "10 MCQ Easy, 5 MCQ Medium, 2 DESCRIPTIVE" ->
+    [{"count": 10, "type": "MCQ", "level": "Easy"}, ...]
+    Type and level may be omitted / "ALL" (= any). Raises ValueError.
+    """
+    sections = []
+    for part in re.split(r"[,\n+]+", text or ""):
+        words = part.split()
+        if not words:
+            continue
+        try:
+            count = int(words[0])
+        except ValueError:
+            raise ValueError(f"section {part.strip()!r} must start with a count")
+        qtype = level = None
+        for w in words[1:]:
+            if w.upper() in _TYPES:
+                qtype = w.upper()
+            elif w.capitalize() in _LEVELS:
+                level = w.capitalize()
+            elif w.upper() not in ("ALL", "ANY", "MIX"):
+                raise ValueError(f"unknown word {w!r} in section {part.strip()!r}")
+        if count > 0:
+            sections.append({"count": count, "type": qtype, "level": level})
+    if not sections:
+        raise ValueError("a blueprint needs at least one section")
+    return sections
+
+def describe_sections(sections) -> str:
+    return ", ".join(" ".join(str(x) for x in (s["count"], s.get("type") or "ALL",
+                                                  s.get("level") or "ALL"))
+                     for s in sections)
+
+def starts_at_ts(bp: dict):
+    """starts_at ("YYYY-MM-DD HH:MM", local time) as a timestamp, or None."""
+    try:
+        return time.mktime(time.strptime(bp.get("starts_at") or "", "%Y-%m-%d %H:%M"))
+    except (ValueError, OverflowError):
+        return None
+
+
+# ---- Paper assembly ----
+def _strata(bp: dict, questions) -> list:
+    return [filter_question_ids(questions, s.get("type"), s.get("level"))
+            for s in bp["sections"]]
+
+def assemble_paper(bp: dict, k: int, questions=None, strata=None, course=None) -> list:
+    """Question indices of paper number k of blueprint `bp`."""
+    questions = load_questions(course) if questions is None else questions
+    strata = _strata(bp, questions) if strata is None else strata
+    rng = random.Random(f"{bp.get('seed', 0)}:{k}")
+    used, paper = set(), []
+    for section, ids in zip(bp["sections"], strata):
+        free = [i for i in ids if i not in used]
+        picked = rng.sample(free, min(section["count"], len(free)))
+        used.update(picked)
+        paper.extend(picked)
+    if bp.get("shuffle", True):
+        rng.shuffle(paper)
+    return paper
+
+
+# ---- Pool ----
+def _pool_path(name: str, course=None) -> str:
+    slug = re.sub(r"[^A-Za-z0-9_-]+", "_", name)
+    folder = course_file(PAPER_POOL_DIR, course)
+    os.makedirs(folder, exist_ok=True)
+    return os.path.join(folder, f"{slug}.json")
+
+def build_pool(name: str, size: int = None, course=None, force: bool = True) -> dict:
+    """
+    Precompute the next `size` papers of blueprint `name`, starting at the
+    current paper counter (which is kept, so a number is never handed out
+    twice and a rebuild after a practice run is used straight away).
+    With force=False an already fresh pool is kept (the prebuild runs in
+    every worker; only the first one to get the build lock does the work).
+    """
+    bp = get_blueprint(name, course)
+    if not bp:
+        raise KeyError(name)
+    size = int(size or bp.get("pool_size") or DEFAULT_POOL_SIZE)
+    path = _pool_path(name, course)
+    # separate lock from the paper counter, so exam starts don't wait on a build
+    with file_lock(path + ".build"):
+        pool = _cached_pool(path)
+        if not force and pool is not None and _is_fresh(pool, bp, course):
+            return pool
+        questions = reload_questions_from_disk(course)
+        strata = _strata(bp, questions)
+        base = _read_counter(path)
+        t0 = time.perf_counter()
+        pool = {
+            "name": name,
+            "seed": bp.get("seed", 0),
+            "sections": bp["sections"],
+            "bank": _bank_version(course),
+            "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "base": base,
+            "papers": [[question_id(questions[i].q)
+                        for i in assemble_paper(bp, k, questions, strata)]
+                       for k in range(base, base + size)],
+        }
+        with file_lock(path):
+            save_json(path, pool)
+    print(f"[blueprints] built {size} paper(s) for {name!r} in "
+          f"{time.perf_counter() - t0:.2f}s")
+    return pool
+
+def _cached_pool(path: str):
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    with _POOLS_LOCK:
+        hit = _POOLS.get(path)
+        if hit and hit[0] == mtime:
+            return hit[1]
+    pool = load_json(path) or None
+    with _POOLS_LOCK:
+        _POOLS[path] = (mtime, pool)
+    return pool
+
+def _bank_version(course=None) -> list:
+    return list(_source_fingerprint(course_file(QUESTIONS_FILE, course)) or ())
+
+def _is_fresh(pool: dict, bp: dict, course=None) -> bool:
+    """Pool was built from this blueprint and the course's current question bank."""
+    return (pool.get("seed") == bp.get("seed", 0)
+            and pool.get("sections") == bp.get("sections")
+            and pool.get("bank") == _bank_version(course))
+
+def _read_counter(path: str) -> int:
+    try:
+        with open(path + ".next") as f:
+            return int(f.read() or 0)
+    except (OSError, ValueError):
+        return 0
+
+def _take_number(path: str) -> int:
+    """Next paper number for this blueprint (atomic across workers)."""
+    counter = path + ".next"
+    with file_lock(path):
+        k = _read_counter(path)
+        with open(counter + ".tmp", "w") as f:
+            f.write(str(k + 1))
+        os.replace(counter + ".tmp", counter)
+    return k
+
+def next_paper(name: str, course=None):
+    """
+    (paper number, list of question dicts) for the next student taking
+    blueprint `name`. A pool pop when a fresh pool exists.
+    """
+    bp = get_blueprint(name, course)
+    if not bp:
+        raise KeyError(name)
+    path = _pool_path(name, course)
+    k = _take_number(path)
+    pool = _cached_pool(path)
+    if pool is not None and _is_fresh(pool, bp, course):
+        j = k - pool.get("base", 0)
+        if 0 <= j < len(pool["papers"]):
+            paper = _pooled_paper(pool["papers"][j], course)
+            if paper is not None:
+                return k, paper
+    questions = load_questions(course)
+    return k, [questions[i].to_dict() for i in assemble_paper(bp, k, questions)]
+
+def _lookup(qids, questions, index):
+    out = []
+    for qid in qids:
+        i = index.get(qid)
+        if i is None or i >= len(questions) or question_id(questions[i].q) != qid:
+            return None
+        out.append(questions[i].to_dict())
+    return out
+
+def _pooled_paper(qids, course=None):
+    """Question dicts for a pooled paper, or None if the bank no longer has them."""
+    questions = load_questions(course)
+    paper = _lookup(qids, questions, _QID_INDEX.get(course) or {})
+    if paper is None:
+        # bank edited since we indexed it (or our cached copy is older than
+        # the pool): re-index, then re-read it from disk
+        for questions in (questions, reload_questions_from_disk(course)):
+            _QID_INDEX[course] = {question_id(q.q): i for i, q in enumerate(questions)}
+            paper = _lookup(qids, questions, _QID_INDEX[course])
+            if paper is not None:
+                break
+    return paper
+
+def pool_status(name: str, course=None) -> dict:
+    bp = get_blueprint(name, course) or {}
+    path = _pool_path(name, course)
+    pool = _cached_pool(path)
+    used = _read_counter(path)
+    if not pool:
+        return {"size": 0, "used": used, "fresh": False, "created": None}
+    return {
+        "size": len(pool["papers"]),
+        "used": max(0, used - pool.get("base", 0)),
+        "fresh": _is_fresh(pool, bp, course),
+        "created": pool.get("created"),
+    }
+
+def delete_pool(name: str, course=None):
+    path = _pool_path(name, course)
+    for p in (path, path + ".next", path + ".build.lock"):
+        try:
+            os.remove(p)
+        except OSError:
+            pass
+
+
+# ---- Scheduled prebuild (called from the attempt sweeper) ----
+def prebuild_due(now=None) -> int:
+    """Build missing/stale pools for blueprints starting within PREBUILD_AHEAD."""
+    global _LAST_PREBUILD_CHECK
+    now = time.time() if now is None else now
+    if now - _LAST_PREBUILD_CHECK < PREBUILD_CHECK:
+        return 0
+    _LAST_PREBUILD_CHECK = now
+    built = 0
+    for course in [None] + list_courses():
+        for name, bp in load_blueprints(course).items():
+            start = starts_at_ts(bp)
+            if start is None or not (now <= start <= now + PREBUILD_AHEAD):
+                continue
+            if not pool_status(name, course)["fresh"]:
+                # re-checked under the build lock: another worker may be first
+                build_pool(name, course=course, force=False)
+                built += 1
+    return built
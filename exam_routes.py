@@ -1,6 +1,12 @@
 # exam_routes.py
 from flask import Blueprint, render_template, request, session, redirect, url_for, flash
-from utils import load_results, save_results, descriptive_similarity, load_questions
+from utils import (load_results, load_questions, filter_question_ids, course_file,
+                   grade_answers, append_history, format_duration, RESULTS_FILE)
+from page_cache import cached_page
+from attempts import (open_attempt, record_answer, claim_attempt,
+                      exam_time_limit, GRACE_SECONDS)
+from exam_blueprints import get_blueprint, next_paper, starts_at_ts
+import proctor
 import time, sys, pprint
 
 exam_bp = Blueprint("exam", __name__, url_prefix="")
@@ -10,9 +16,15 @@ def history():
     if "username" not in session:
         return redirect(url_for("auth.auth_page"))
     username = session["username"]
-    results = load_results()
-    return render_template("user_history.html", username=username,
-                           history=results.get(username, {}).get("history", []))
+    course = session.get("course")
+
+    def render():
+        results = load_results(course)
+        return render_template("user_history.html", username=username,
+                               history=results.get(username, {}).get("history", []))
+
+    return cached_page(f"history:{course or ''}:{username}",
+                       [course_file(RESULTS_FILE, course)], render, course)
 
 
 @exam_bp.route("/exam", methods=["GET", "POST"])
@@ -33,6 +45,13 @@ def exam():
     answers = session.get("answers", {}) or {}
     question = questions[index]
 
+    # ⏱ SERVER-ENFORCED DEADLINE
+    attempt_id = session.get("attempt_id")
+    deadline = session.get("deadline")
+    if deadline and time.time() > deadline + GRACE_SECONDS:
+        flash("Time is up! Your exam was submitted.", "error")
+        return redirect(url_for("exam.result"))
+
     if request.method == "POST":
         action = request.form.get("action")
         raw_ans = request.form.get("answer")
@@ -50,6 +69,9 @@ def exam():
         # Always store answer (even empty)
         answers[str(index)] = ans
         session["answers"] = answers
+        if attempt_id and not record_answer(attempt_id, index, ans):
+            flash("Time is up! Your exam was submitted.", "error")
+            return redirect(url_for("exam.result"))
 
         print("Answers AFTER:", session["answers"], file=sys.stderr)
         print("==================", file=sys.stderr)
@@ -63,6 +85,8 @@ def exam():
             # FORCE EMPTY ANSWER (counts as skipped)
             answers[str(index)] = ""
             session["answers"] = answers
+            if attempt_id:
+                record_answer(attempt_id, index, "")
 
             if index < len(questions) - 1:
                 session["index"] = index + 1
@@ -81,13 +105,23 @@ def exam():
             else:
                 return redirect(url_for("exam.result"))
 
+        # 👁 live proctor counters
+        if attempt_id:
+            proctor.track(attempt_id, session["username"], session.get("exam", ""),
+                          int(session.get("index", 0)), answers, len(questions),
+                          session.get("start_time", 0), deadline or 0,
+                          course=session.get("course"))
+
         return redirect(url_for("exam.exam"))
 
     selected = answers.get(str(index), "")
+    time_limit = session.get("time_limit") or 600
+    remaining = max(0, int(deadline - time.time())) if deadline else time_limit
     return render_template("exam.html", question=question,
                            index=index + 1, total=len(questions),
                            selected=selected,
-                           difficulty=question.get("level", "N/A"))
+                           difficulty=question.get("level", "N/A"),
+                           time_limit=time_limit, remaining=remaining)
 
 
 @exam_bp.route("/result")
@@ -97,69 +131,32 @@ def result():
 
     questions = session.get("questions", [])
     answers = session.get("answers", {}) or {}
+    end = time.time()
+
+    # ⏱ Close the server-side attempt. Whoever claims it stores it: if the
+    # sweeper already auto-submitted it, results.json has it already.
+    attempt_id = session.get("attempt_id")
+    claimed = False
+    if attempt_id and not session.get("attempt_closed"):
+        attempt = claim_attempt(attempt_id)
+        proctor.close(attempt_id)
+        if attempt is not None:
+            answers = attempt.get("answers", answers)
+            claimed = True
+        session["attempt_closed"] = True
+        session["answers"] = answers
+    if session.get("deadline"):
+        end = min(end, session["deadline"])
 
-    total = 0.0
-    score = 0.0
-    wrong = 0
-    skipped = 0
-    descriptive_reports = []
-
-    for i, q in enumerate(questions):
-        qtype = q.get("type", "MCQ")
-        ans = answers.get(str(i), "") or ""
-
-        # MCQ SCORING
-        if qtype == "MCQ":
-            total += 1
-            if not ans:
-                skipped += 1
-            elif ans == q.get("correct"):
-                score += 1
-            else:
-                wrong += 1
-
-        # DESCRIPTIVE SCORING
-        else:
-            max_marks = float(q.get("max_marks", 5))
-            total += max_marks
-
-            if not ans.strip():
-                skipped += 1
-                descriptive_reports.append({
-                    "q": q["q"],
-                    "similarity": 0,
-                    "originality": 100,
-                    "grade": "Not Answered",
-                    "marks": 0
-                })
-                continue
-
-            sim = descriptive_similarity(ans, q.get("answer_key", ""))
-            s = sim * 100
-
-            if sim >= 0.75:
-                marks = max_marks; grade = "Excellent"
-            elif sim >= 0.50:
-                marks = max_marks * 0.7; grade = "Good"
-            elif sim >= 0.30:
-                marks = max_marks * 0.4; grade = "Fair"
-            else:
-                marks = 0; grade = "Weak"
-
-            marks = round(marks, 2)
-            score += marks
-
-            descriptive_reports.append({
-                "q": q["q"],
-                "similarity": round(s, 2),
-                "originality": round(100 - s, 2),
-                "grade": grade,
-                "marks": marks
-            })
+    graded = grade_answers(questions, answers)
+    score = graded["score"]
+    wrong = graded["wrong"]
+    skipped = graded["skipped"]
+    total = graded["total"]
+    descriptive_reports = graded["descriptive_reports"]
 
     # TIME
-    t = int(time.time() - session.get("start_time", time.time()))
-    time_taken = f"{t//60}m {t%60}s"
+    time_taken = format_duration(end - session.get("start_time", end))
 
     session["score"] = round(score, 2)
     session["wrong"] = wrong
@@ -168,6 +165,18 @@ def result():
     session["time_taken"] = time_taken
     session["descriptive_reports"] = descriptive_reports
 
+    # 💾 Store it now -- the attempt file is gone, so this is the only copy
+    if claimed:
+        append_history(session["username"], {
+            "score": session["score"],
+            "total": total,
+            "time_taken": time_taken,
+            "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "exam": session.get("exam", ""),
+            "descriptive_reports": descriptive_reports,
+            "answers": graded["answers"]
+        }, course=session.get("course"))
+
     return render_template("result.html", score=session["score"], wrong=wrong,
                            skipped=skipped, total=total,
                            time_taken=time_taken,
@@ -179,36 +188,28 @@ def save_result():
     if "username" not in session:
         return redirect(url_for("auth.auth_page"))
 
-    username = session["username"]
-    results = load_results()
-
-    if username not in results:
-        results[username] = {"history": []}
-
-    results[username]["history"].append({
-        "score": session["score"],
-        "total": session["total_points"],
-        "time_taken": session["time_taken"],
-        "date": time.strftime("%Y-%m-%d %H:%M:%S"),
-        "descriptive_reports": session["descriptive_reports"]
-    })
-
-    save_results(results)
+    # already stored by /result (or auto-submitted by the deadline sweeper)
     return redirect(url_for("exam.leaderboard"))
 
 
 @exam_bp.route("/leaderboard")
 def leaderboard():
-    results = load_results()
-
     def pct(x):
         u = x[1]
         s = float(u.get("score", 0))
         t = float(u.get("total", 1))
         return s / t if t else 0
 
-    sorted_users = sorted(results.items(), key=pct, reverse=True)
-    return render_template("leaderboard.html", leaderboard=sorted_users)
+    # 🏫 one leaderboard (and cache entry) per course
+    course = session.get("course")
+
+    def render():
+        results = load_results(course)
+        sorted_users = sorted(results.items(), key=pct, reverse=True)
+        return render_template("leaderboard.html", leaderboard=sorted_users)
+
+    return cached_page(f"leaderboard:{course or ''}",
+                       [course_file(RESULTS_FILE, course)], render, course)
 
 @exam_bp.route("/start_exam", methods=["POST"])
 def start_exam():
@@ -218,41 +219,66 @@ def start_exam():
     from utils import load_questions
     import random, time
 
-    qtype = request.form.get("type") or "MCQ"
-    level = request.form.get("level")
-    count = int(request.form.get("count", 5))
-
-    all_qs = load_questions()
-
-    # ✅ FILTER TYPE
-    if qtype == "MCQ":
-        filtered = [q for q in all_qs if q.get("type") == "MCQ"]
-
-    elif qtype == "DESCRIPTIVE":
-        filtered = [q for q in all_qs if q.get("type") == "DESCRIPTIVE"]
-
-    else:  # MIX
-        filtered = all_qs
-
-    # ✅ FILTER DIFFICULTY
-    if level != "ALL":
-        filtered = [q for q in filtered if q.get("level") == level]
+    course = session.get("course")
+    blueprint = request.form.get("blueprint")
+
+    if blueprint:
+        # 📋 NAMED EXAM: next pre-assembled paper from the pool
+        bp = get_blueprint(blueprint, course)
+        if not bp:
+            flash("Unknown exam!", "error")
+            return redirect(url_for("auth.choose_exam"))
+        start = starts_at_ts(bp)
+        if start and time.time() < start:
+            flash(f"{blueprint} starts at {bp['starts_at']}!", "error")
+            return redirect(url_for("auth.choose_exam"))
+        _, paper = next_paper(blueprint, course)
+        qtype = blueprint
+        time_limit = (int(float(bp["time_limit"]) * 60) if bp.get("time_limit")
+                      else exam_time_limit(blueprint, course))
+    else:
+        qtype = request.form.get("type") or "MCQ"
+        level = request.form.get("level")
+        count = int(request.form.get("count", 5))
+
+        all_qs = load_questions(course)
+
+        # ✅ FILTER TYPE + DIFFICULTY (MIX / ALL = any)
+        ids = filter_question_ids(
+            all_qs,
+            qtype if qtype in ("MCQ", "DESCRIPTIVE") else None,
+            level if level != "ALL" else None,
+        )
+
+        # ✅ LIMIT COUNT
+        if count > len(ids):
+            count = len(ids)
+
+        selected_qs = [all_qs[i] for i in random.sample(ids, count)]
+
+        # ✅ SAVE TO SESSION (cached bank holds compact Question records)
+        paper = [q.to_dict() for q in selected_qs]
+        time_limit = exam_time_limit(qtype, course)
 
     # ❌ If no questions
-    if not filtered:
+    if not paper:
         flash("No questions found!", "error")
         return redirect(url_for("auth.choose_exam"))
 
-    # ✅ LIMIT COUNT
-    if count > len(filtered):
-        count = len(filtered)
-
-    selected_qs = random.sample(filtered, count)
+    attempt = open_attempt(session["username"], paper, time_limit, exam=qtype, course=course)
 
-    # ✅ SAVE TO SESSION
-    session["questions"] = selected_qs
+    session["questions"] = paper
     session["index"] = 0
     session["answers"] = {}
-    session["start_time"] = int(time.time())
+    session["start_time"] = attempt["start_time"]
+    session["deadline"] = attempt["deadline"]
+    session["time_limit"] = time_limit
+    session["attempt_id"] = attempt["id"]
+    session["exam"] = qtype
+    for k in ("attempt_closed", "score"):
+        session.pop(k, None)
+
+    proctor.track(attempt["id"], session["username"], qtype, 0, {}, len(paper),
+                  attempt["start_time"], attempt["deadline"], course=course)
 
     return redirect(url_for("exam.exam"))
\ No newline at end of file
@@ -0,0 +1,31 @@
+# export_results.py
+"""
+Export stored attempts from results.json.
+
+    python export_results.py --format csv -o semester.csv --since 2025-01-01 --until 2025-06-30
+    python export_results.py --format jsonl --users alice,bob --exam Midterm
+"""
+import sys
+import argparse
+from results_export import WRITERS
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--format", choices=sorted(WRITERS), default="csv")
+    ap.add_argument("--since", help="YYYY-MM-DD[ HH:MM:SS], inclusive")
+    ap.add_argument("--until", help="YYYY-MM-DD[ HH:MM:SS], inclusive")
+    ap.add_argument("--users", help="comma separated usernames")
+    ap.add_argument("--exam", help="exam type or blueprint name")
+    ap.add_argument("--course", help="course partition (default: the main bank)")
+    ap.add_argument("-o", "--output", help="file (default: stdout)")
+    args = ap.parse_args()
+
+    users = [u.strip() for u in (args.users or "").split(",") if u.strip()] or None
+    out = open(args.output, "w", newline="", encoding="utf-8") if args.output else sys.stdout
+    try:
+        for chunk in WRITERS[args.format](since=args.since, until=args.until,
+                                          users=users, exam=args.exam, course=args.course):
+            out.write(chunk)
+    finally:
+        if out is not sys.stdout:
+            out.close()
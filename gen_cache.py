@@ -0,0 +1,120 @@
+# gen_cache.py
+"""
+Persistent cache for AI question generation (admin api_generate).
+
+Entries are keyed by (model name, question type, normalized topic), not by
+count: a request takes unused cached questions first and only asks the model
+for the shortfall (plus a small prefetch that is kept for next time).
+Each cached question expires GEN_CACHE_TTL after it was generated, and the
+file is bounded to GEN_CACHE_MAX_ENTRIES topics (least recently used
+evicted first). Every read-modify-write holds file_lock(GEN_CACHE_FILE), so
+two workers never hand out the same cached question.
+"""
+import re
+import time
+import hashlib
+
+from utils import load_json, save_json, file_lock
+
+GEN_CACHE_FILE = "gen_cache.json"
+GEN_CACHE_TTL = 7 * 24 * 3600      # seconds
+GEN_CACHE_MAX_ENTRIES = 200
+GEN_CACHE_MAX_ITEMS = 50           # unused questions kept per topic
+PREFETCH_RATIO = 0.5               # extra items requested per model call
+PREFETCH_MAX = 10
+
+
+def normalize_prompt(text: str) -> str:
+    t = re.sub(r"[^\w\s]", " ", (text or "").lower())
+    return " ".join(t.split())
+
+
+def cache_key(model: str, qtype: str, topic: str) -> str:
+    raw = f"{model}|{qtype}|{normalize_prompt(topic)}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def prefetch_count(shortfall: int) -> int:
+    """How many questions to ask the model for to cover `shortfall`."""
+    return shortfall + min(PREFETCH_MAX, int(shortfall * PREFETCH_RATIO + 0.5))
+
+
+def _load(now):
+    data = load_json(GEN_CACHE_FILE) or {}
+    entries = data.get("entries", {})
+    stats = data.get("stats", {})
+    for k in list(entries):
+        e = entries[k]
+        # items are {"question": ..., "expires": ts}; bare questions predate that
+        default = e.get("created", 0) + GEN_CACHE_TTL
+        e["items"] = [it if "expires" in it else {"question": it, "expires": default}
+                      for it in e.get("items", [])]
+        e["items"] = [it for it in e["items"] if it["expires"] > now]
+        if not e["items"]:
+            del entries[k]
+    return entries, stats
+
+
+def _save(entries, stats):
+    if len(entries) > GEN_CACHE_MAX_ENTRIES:
+        keep = sorted(entries, key=lambda k: entries[k].get("last_used", 0), reverse=True)
+        entries = {k: entries[k] for k in keep[:GEN_CACHE_MAX_ENTRIES]}
+    save_json(GEN_CACHE_FILE, {"entries": entries, "stats": stats})
+
+
+def take(key: str, count: int) -> list:
+    """Pop up to `count` cached, still-unused questions for `key`."""
+    now = time.time()
+    with file_lock(GEN_CACHE_FILE):
+        entries, stats = _load(now)
+        entry = entries.get(key)
+        if not entry or not entry.get("items"):
+            return []
+        items = entry["items"][:count]
+        entry["items"] = entry["items"][count:]
+        entry["last_used"] = now
+        _save(entries, stats)
+    return [it["question"] for it in items]
+
+
+def put(key: str, items: list):
+    """Store generated-but-unused questions for later requests."""
+    if not items:
+        return
+    now = time.time()
+    with file_lock(GEN_CACHE_FILE):
+        entries, stats = _load(now)
+        entry = entries.setdefault(key, {"created": now, "items": []})
+        fresh = [{"question": q, "expires": now + GEN_CACHE_TTL} for q in items]
+        entry["items"] = (entry["items"] + fresh)[:GEN_CACHE_MAX_ITEMS]
+        entry["last_used"] = now
+        _save(entries, stats)
+
+
+def record(requested: int, from_cache: int, generated: int):
+    """Update hit-rate stats for one api_generate call."""
+    with file_lock(GEN_CACHE_FILE):
+        entries, stats = _load(time.time())
+        stats["requests"] = stats.get("requests", 0) + 1
+        if from_cache >= requested:
+            stats["hits"] = stats.get("hits", 0) + 1
+        elif from_cache:
+            stats["partial_hits"] = stats.get("partial_hits", 0) + 1
+        stats["items_from_cache"] = stats.get("items_from_cache", 0) + from_cache
+        stats["items_generated"] = stats.get("items_generated", 0) + generated
+        _save(entries, stats)
+
+
+def cache_stats() -> dict:
+    entries, stats = _load(time.time())
+    req = stats.get("requests", 0)
+    served = stats.get("items_from_cache", 0) + stats.get("items_generated", 0)
+    return {
+        "requests": req,
+        "hits": stats.get("hits", 0),
+        "partial_hits": stats.get("partial_hits", 0),
+        "hit_rate": round(100.0 * stats.get("hits", 0) / req, 1) if req else 0.0,
+        "item_hit_rate": round(100.0 * stats.get("items_from_cache", 0) / served, 1) if served else 0.0,
+        "topics": len(entries),
+        "cached_items": sum(len(e.get("items", [])) for e in entries.values()),
+    }
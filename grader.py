@@ -0,0 +1,230 @@
+# grader.py
+"""
+Tiered descriptive grading.
+
+Stage 1 (lexical, microseconds): answer keys are stored as
+"keywords: a, b, c". Each key is compiled once into a KeywordMatcher (one
+stem set per keyword) and the student answer is scored by keyword
+coverage; multi-word keywords get partial credit.
+
+Stage 2 (semantic, milliseconds+): only answers whose coverage falls in the
+uncertain band [LOW_BAND, HIGH_BAND) go to descriptive_similarity(). Clearly
+covered or clearly empty answers never touch the transformer, and if
+sentence-transformers isn't installed the lexical score is used instead of
+the old silent 0.0.
+
+grader_stats() reports per-stage counts/timing and how often the lexical
+grade agreed with the semantic one inside the band, to tune the band. Each
+process (gunicorn worker, re-grade pool process) flushes its counters to
+grader_stats/<pid>-<start>.json at most every STATS_FLUSH_INTERVAL seconds,
+and grader_stats() sums those files, so the numbers cover all workers.
+"""
+import os
+import re
+import time
+import threading
+from functools import lru_cache
+
+from utils import (load_json, save_json, descriptive_marks, descriptive_similarity,
+                   ensure_similarity_model, similarity_batch)
+
+LOW_BAND = 0.15
+HIGH_BAND = 0.80
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset("""
+a an the and or of to in on at for by with from as is are was were be been
+it its this that these those which who whom what how why when where into
+""".split())
+_SUFFIXES = ("ations", "ation", "ments", "ment", "ities", "ity", "ings", "ing",
+             "edly", "ies", "ied", "ed", "es", "ly", "s")
+
+
+def _stem(word: str) -> str:
+    for suf in _SUFFIXES:
+        if word.endswith(suf) and len(word) - len(suf) >= 3:
+            word = word[: -len(suf)]
+            break
+    return word
+
+
+def stems(text: str) -> list:
+    return [_stem(t) for t in _TOKEN.findall((text or "").lower()) if t not in _STOPWORDS]
+
+
+class KeywordMatcher:
+    """Precompiled answer key: one frozenset of stems per keyword."""
+    __slots__ = ("keywords",)
+
+    def __init__(self, answer_key: str):
+        k = (answer_key or "").strip()
+        if k.lower().startswith("keywords:"):
+            k = k.split(":", 1)[1]
+        parts = [p for p in re.split(r"[,\n;]+", k) if p.strip()]
+        self.keywords = [fs for fs in (frozenset(stems(p)) for p in parts) if fs]
+
+    def coverage(self, answer: str) -> float:
+        """Fraction of keywords present in `answer` (0..1)."""
+        if not self.keywords:
+            return 0.0
+        have = set(stems(answer))
+        got = sum(len(kw & have) / len(kw) for kw in self.keywords)
+        return got / len(self.keywords)
+
+
+@lru_cache(maxsize=4096)
+def compile_key(answer_key: str) -> KeywordMatcher:
+    return KeywordMatcher(answer_key)
+
+
+def grade_band(sim: float) -> str:
+    """Same buckets grade_answers() uses."""
+    return descriptive_marks(sim, 1)[1]
+
+
+# ---- Stats ----
+STATS_DIR = "grader_stats"
+STATS_FLUSH_INTERVAL = 5       # seconds
+_STATS_FILE = os.path.join(STATS_DIR, f"{os.getpid()}-{int(time.time())}.json")
+_STATS_DIRTY = False
+_STATS_FLUSHED = 0.0
+_STATS_LOCK = threading.Lock()
+_STATS = {
+    "lexical": {"count": 0, "seconds": 0.0},
+    "semantic": {"count": 0, "seconds": 0.0},
+    "fallback": {"count": 0},      # band answers graded lexically (no model)
+    "band_agree": 0,               # lexical grade == semantic grade in band
+}
+
+
+def _add(stage, dt):
+    with _STATS_LOCK:
+        _STATS[stage]["count"] += 1
+        _STATS[stage]["seconds"] += dt
+
+
+def flush_stats(force: bool = False):
+    """Write this process's counters if they changed (throttled)."""
+    global _STATS_DIRTY, _STATS_FLUSHED
+    now = time.time()
+    with _STATS_LOCK:
+        if not _STATS_DIRTY or (not force and now - _STATS_FLUSHED < STATS_FLUSH_INTERVAL):
+            return
+        data = {k: dict(v) if isinstance(v, dict) else v for k, v in _STATS.items()}
+        _STATS_DIRTY = False
+        _STATS_FLUSHED = now
+    os.makedirs(STATS_DIR, exist_ok=True)
+    save_json(_STATS_FILE, data)
+
+
+def _changed():
+    global _STATS_DIRTY
+    _STATS_DIRTY = True
+    flush_stats()
+
+
+def grader_stats() -> dict:
+    """Counters summed over every process that has graded (flushed files)."""
+    flush_stats(force=True)
+    total = {"lexical": {"count": 0, "seconds": 0.0}, "semantic": {"count": 0, "seconds": 0.0},
+             "fallback": {"count": 0}, "band_agree": 0}
+    names = os.listdir(STATS_DIR) if os.path.isdir(STATS_DIR) else []
+    for name in names:
+        if not name.endswith(".json"):
+            continue
+        data = load_json(os.path.join(STATS_DIR, name))
+        for stage in ("lexical", "semantic", "fallback"):
+            for k in total[stage]:
+                total[stage][k] += data.get(stage, {}).get(k, 0)
+        total["band_agree"] += data.get("band_agree", 0)
+    lex, sem = total["lexical"], total["semantic"]
+    out = {
+        "band": [LOW_BAND, HIGH_BAND],
+        "workers": sum(1 for n in names if n.endswith(".json")),
+        "lexical": lex,
+        "semantic": sem,
+        "fallback": total["fallback"],
+        "band_agreement": round(total["band_agree"] / sem["count"], 3) if sem["count"] else None,
+    }
+    for st in (lex, sem):
+        st["avg_ms"] = round(st["seconds"] / st["count"] * 1000, 3) if st["count"] else None
+        st["seconds"] = round(st["seconds"], 4)
+    return out
+
+
+def score_descriptive(answer: str, answer_key: str):
+    """
+    Similarity in [0, 1] for one descriptive answer, plus which stage decided
+    it: "lexical", "semantic" or "lexical-fallback".
+    """
+    if not answer or not answer.strip() or not answer_key:
+        return 0.0, "lexical"
+
+    t0 = time.perf_counter()
+    lex = compile_key(answer_key).coverage(answer)
+    _add("lexical", time.perf_counter() - t0)
+
+    if lex < LOW_BAND or lex >= HIGH_BAND:
+        _changed()
+        return lex, "lexical"
+
+    if not ensure_similarity_model():
+        with _STATS_LOCK:
+            _STATS["fallback"]["count"] += 1
+        _changed()
+        return lex, "lexical-fallback"
+
+    t0 = time.perf_counter()
+    sem = descriptive_similarity(answer, answer_key)
+    _add("semantic", time.perf_counter() - t0)
+    if grade_band(sem) == grade_band(lex):
+        with _STATS_LOCK:
+            _STATS["band_agree"] += 1
+    _changed()
+    return sem, "semantic"
+
+
+def score_descriptive_batch(answers, answer_key: str):
+    """
+    score_descriptive() for many answers to one question: lexical pass for
+    all, then a single batched encode for the ones in the uncertain band.
+    Returns [(similarity, stage)] in input order.
+    """
+    out = []
+    band = []
+    matcher = compile_key(answer_key) if answer_key else None
+    t0 = time.perf_counter()
+    for i, ans in enumerate(answers):
+        if not ans or not ans.strip() or matcher is None:
+            out.append((0.0, "lexical"))
+            continue
+        lex = matcher.coverage(ans)
+        out.append((lex, "lexical"))
+        if LOW_BAND <= lex < HIGH_BAND:
+            band.append(i)
+    with _STATS_LOCK:
+        _STATS["lexical"]["count"] += len(answers)
+        _STATS["lexical"]["seconds"] += time.perf_counter() - t0
+
+    if not band:
+        _changed()
+        return out
+    if not ensure_similarity_model():
+        with _STATS_LOCK:
+            _STATS["fallback"]["count"] += len(band)
+        _changed()
+        for i in band:
+            out[i] = (out[i][0], "lexical-fallback")
+        return out
+
+    t0 = time.perf_counter()
+    sims = similarity_batch([answers[i] for i in band], answer_key)
+    with _STATS_LOCK:
+        _STATS["semantic"]["count"] += len(band)
+        _STATS["semantic"]["seconds"] += time.perf_counter() - t0
+        _STATS["band_agree"] += sum(grade_band(sem) == grade_band(out[i][0])
+                                    for i, sem in zip(band, sims))
+    _changed()
+    for i, sem in zip(band, sims):
+        out[i] = (sem, "semantic")
+    return out
@@ -0,0 +1,18 @@
+# migrate_questions.py
+"""
+Offline question-bank migration.
+
+    python migrate_questions.py [questions.json]
+
+Normalizes every question (type casing, answer keys, max_marks) and writes the
+file back, so app startup / first load doesn't pay for it.
+"""
+import sys
+import time
+from utils import migrate_questions_file, QUESTIONS_FILE
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else QUESTIONS_FILE
+    t0 = time.time()
+    before, after = migrate_questions_file(path)
+    print(f"[migrate] {path}: {before} -> {after} questions in {time.time()-t0:.3f}s")
@@ -0,0 +1,141 @@
+# page_cache.py
+"""
+Rendered-page cache + conditional GET for read-mostly pages
+(leaderboard, history, admin tables).
+
+A page's version is derived from the (mtime_ns, size) of the JSON files it
+reads, so every gunicorn worker computes the same ETag without talking to
+the others, and any save_json() to one of those files changes it.
+Browsers that poll get `304 Not Modified` after one os.stat per file;
+other hits are served from a size-bounded LRU of rendered HTML instead of
+load + sort + render. save_json() also drops the keys that depend on the
+written file (per-key invalidation) so stale HTML doesn't occupy the LRU.
+Each course gets its own LRU, so one busy course's per-user pages never
+evict another course's leaderboard or dashboard.
+"""
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from email.utils import formatdate
+
+from flask import request, make_response
+
+PAGE_CACHE_SIZE = 256
+
+
+class LRUCache:
+    """Small thread-safe LRU: key -> (etag, deps, html)."""
+
+    def __init__(self, maxsize=PAGE_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item
+
+    def put(self, key, item):
+        with self._lock:
+            self._data[key] = item
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def invalidate_file(self, path):
+        """Drop every cached page that was rendered from `path`."""
+        with self._lock:
+            for key in [k for k, (_, deps, _) in self._data.items() if path in deps]:
+                del self._data[key]
+
+    def __len__(self):
+        return len(self._data)
+
+
+class CoursePageCache:
+    """One LRUCache (of PAGE_CACHE_SIZE pages) per course."""
+
+    def __init__(self, maxsize=PAGE_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._caches = {}
+        self._lock = threading.Lock()
+
+    def for_course(self, course=None) -> LRUCache:
+        with self._lock:
+            cache = self._caches.get(course or None)
+            if cache is None:
+                cache = self._caches[course or None] = LRUCache(self.maxsize)
+            return cache
+
+    def invalidate_file(self, path):
+        with self._lock:
+            caches = list(self._caches.values())
+        for cache in caches:
+            cache.invalidate_file(path)
+
+    def __len__(self):
+        return sum(len(c) for c in list(self._caches.values()))
+
+
+page_cache = CoursePageCache()
+
+
+def data_version(files):
+    """Return (etag, last_modified_ts) for the current state of `files`."""
+    parts = []
+    newest = 0.0
+    for path in files:
+        try:
+            st = os.stat(path)
+            parts.append(f"{path}:{st.st_mtime_ns}:{st.st_size}")
+            newest = max(newest, st.st_mtime)
+        except OSError:
+            parts.append(f"{path}:-")
+    return hashlib.sha1("|".join(parts).encode()).hexdigest(), newest
+
+
+def cached_page(key: str, deps, render, course=None):
+    """
+    Serve `render()` (a function returning HTML) for `key` of `course`, which
+    depends on the files in `deps`. Handles If-None-Match / If-Modified-Since -> 304.
+    If `render()` returns a Response instead of HTML it is passed through.
+    """
+    version, mtime = data_version(deps)
+    etag = hashlib.sha1(f"{key}|{version}".encode()).hexdigest()
+
+    if request.if_none_match and etag in request.if_none_match:
+        resp = make_response("", 304)
+    elif (not request.if_none_match and request.if_modified_since
+          and mtime and int(mtime) <= request.if_modified_since.timestamp()):
+        resp = make_response("", 304)
+    else:
+        cache = page_cache.for_course(course)
+        item = cache.get(key)
+        if item is not None and item[0] == etag:
+            html = item[2]
+        else:
+            html = render()
+            if not isinstance(html, str):
+                return html   # e.g. a redirect -- never cached
+            cache.put(key, (etag, tuple(deps), html))
+        resp = make_response(html)
+
+    resp.set_etag(etag)
+    if mtime:
+        resp.headers["Last-Modified"] = formatdate(mtime, usegmt=True)
+    # private: pages can be per-user; no-cache: always revalidate
+    resp.headers["Cache-Control"] = "private, no-cache"
+    return resp
@@ -0,0 +1,141 @@
+# proctor.py
+"""
+Live view of in-progress attempts for the admin proctor page.
+
+Each worker keeps a small in-memory dict of the attempts it has seen
+(question index, answered/skipped counts), updated on every /exam POST.
+It is flushed to proctor/<pid>.json at most every FLUSH_INTERVAL seconds,
+and the admin snapshot merges those per-worker files (one per worker, not
+one per student) into per-exam aggregates. The merged snapshot is cached
+for SNAPSHOT_TTL seconds, so any number of open proctor tabs costs one
+merge per TTL; each admin only sees the attempts of their current course.
+
+A closed attempt can linger in another worker's file until that worker
+flushes, so the merge drops attempts whose attempts/<id>.json is gone
+(claimed = submitted) and, for an attempt seen by several workers, keeps
+the most recently updated record.
+"""
+import os
+import time
+import threading
+
+from utils import load_json, save_json
+
+PROCTOR_DIR = "proctor"
+ATTEMPTS_DIR = "attempts"      # same as attempts.ATTEMPTS_DIR (that module imports us)
+FLUSH_INTERVAL = 2     # seconds
+SNAPSHOT_TTL = 2       # seconds
+
+_LIVE = {}             # attempt_id -> live state (this worker only)
+_LOCK = threading.Lock()
+_DIRTY = False
+_LAST_FLUSH = 0.0
+
+_MERGED = None         # attempt_id -> state, all workers (cached for SNAPSHOT_TTL)
+_MERGED_AT = 0.0
+
+
+def track(attempt_id: str, username: str, exam: str, index: int, answers: dict,
+          total: int, start_time: int, deadline: int, course=None):
+    """Record the current position of one attempt (cheap; called per POST)."""
+    global _DIRTY
+    answered = sum(1 for a in (answers or {}).values() if a)
+    skipped = sum(1 for a in (answers or {}).values() if not a)
+    with _LOCK:
+        _LIVE[attempt_id] = {
+            "username": username,
+            "exam": exam or "MIX",
+            "course": course,
+            "index": index,
+            "total": total,
+            "answered": answered,
+            "skipped": skipped,
+            "start_time": start_time,
+            "deadline": deadline,
+            "updated_at": time.time(),
+        }
+        _DIRTY = True
+    flush()
+
+
+def close(attempt_id: str):
+    """Drop a submitted / auto-submitted attempt from the live view."""
+    global _DIRTY
+    with _LOCK:
+        if _LIVE.pop(attempt_id, None) is not None:
+            _DIRTY = True
+    flush()
+
+
+def flush(force: bool = False):
+    """Write this worker's live state if it changed (throttled)."""
+    global _DIRTY, _LAST_FLUSH
+    now = time.time()
+    with _LOCK:
+        if not _DIRTY or (not force and now - _LAST_FLUSH < FLUSH_INTERVAL):
+            return
+        # drop attempts that are long past their deadline
+        for aid in [a for a, st in _LIVE.items() if st["deadline"] < now - 60]:
+            del _LIVE[aid]
+        data = dict(_LIVE)
+        _DIRTY = False
+        _LAST_FLUSH = now
+    os.makedirs(PROCTOR_DIR, exist_ok=True)
+    save_json(os.path.join(PROCTOR_DIR, f"{os.getpid()}.json"), data)
+
+
+def _merge_workers(now: float) -> dict:
+    merged = {}
+    if not os.path.isdir(PROCTOR_DIR):
+        return merged
+    for name in os.listdir(PROCTOR_DIR):
+        if not name.endswith(".json"):
+            continue
+        for aid, st in load_json(os.path.join(PROCTOR_DIR, name)).items():
+            if st.get("deadline", 0) < now:
+                continue
+            if st.get("updated_at", 0) >= merged.get(aid, {}).get("updated_at", -1):
+                merged[aid] = st
+    # attempts already claimed (submitted / swept) no longer have their file
+    return {aid: st for aid, st in merged.items()
+            if os.path.exists(os.path.join(ATTEMPTS_DIR, f"{aid}.json"))}
+
+
+def snapshot(course=None) -> dict:
+    """
+    Per-exam aggregates of running attempts in `course`:
+        {"generated_at": ..., "exams": {exam: {"active", "avg_index",
+          "answered", "skipped", "students": [...]}}}
+    """
+    global _MERGED, _MERGED_AT
+    now = time.time()
+    if _MERGED is None or now - _MERGED_AT >= SNAPSHOT_TTL:
+        flush(force=True)
+        _MERGED = _merge_workers(now)
+        _MERGED_AT = now
+
+    exams = {}
+    for st in _MERGED.values():
+        if st.get("course") != course:
+            continue
+        ex = exams.setdefault(st["exam"], {
+            "active": 0, "avg_index": 0.0, "answered": 0, "skipped": 0, "students": [],
+        })
+        ex["active"] += 1
+        ex["answered"] += st["answered"]
+        ex["skipped"] += st["skipped"]
+        ex["avg_index"] += st["index"] + 1
+        ex["students"].append({
+            "username": st["username"],
+            "question": st["index"] + 1,
+            "total": st["total"],
+            "answered": st["answered"],
+            "skipped": st["skipped"],
+            "elapsed": int(now - st["start_time"]),
+            "remaining": max(0, int(st["deadline"] - now)),
+        })
+    for ex in exams.values():
+        ex["avg_index"] = round(ex["avg_index"] / ex["active"], 1)
+        ex["students"].sort(key=lambda s: s["username"])
+
+    return {"generated_at": int(_MERGED_AT), "exams": exams}
@@ -0,0 +1,33 @@
+# regrade.py
+"""
+Re-grade stored attempts for questions in the bank.
+
+    python regrade.py --index                # rebuild answer_index.json first
+    python regrade.py <question number> ...  # 1-based, as on the admin dashboard
+    python regrade.py --workers 8 3
+    python regrade.py --course CS101 --index 1
+"""
+import argparse
+from utils import load_questions, rebuild_answer_index
+from regrading import regrade_question
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("numbers", nargs="*", type=int)
+    ap.add_argument("--index", action="store_true", help="rebuild the answer index")
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--course", help="course partition (default: the main bank)")
+    args = ap.parse_args()
+
+    if args.index:
+        index = rebuild_answer_index(args.course)
+        print(f"[regrade] indexed {len(index)} question id(s)")
+
+    questions = load_questions(args.course)
+    for n in args.numbers:
+        q = questions[n - 1].to_dict()
+        job = regrade_question(q, workers=args.workers, course=args.course)
+        secs = job["finished"] - job["started"]
+        print(f"[regrade] #{n} {q['q'][:60]!r}: {job['total']} answer(s) in "
+              f"{job['attempts']} attempt(s), {job['changed']} changed, "
+              f"{job['status']} in {secs:.2f}s")
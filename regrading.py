@@ -0,0 +1,208 @@
+# regrading.py
+"""
+Bulk re-grading of stored attempts after a question's answer_key,
+max_marks or correct option changes.
+
+1. answer_index.json (question id -> [username, history position]) finds the
+   affected attempts without scanning results.json.
+2. Their stored answers are graded in chunks; descriptive chunks run on a
+   process pool (REGRADE_WORKERS, spawn context) and each chunk is
+   batch-encoded by the similarity backend (grader.score_descriptive_batch).
+3. All new marks are applied under results_lock() in one atomic write of
+   results.json, so readers see either the old or the fully re-graded data.
+
+Jobs for the same question run one at a time in a process, and a job whose
+key was edited again while it graded (the bank no longer matches it) is
+dropped as "superseded" instead of overwriting the newer job's marks.
+
+Progress is written to regrade_jobs/<job_id>.json and shown on the admin
+dashboard; regrade.py runs the same pipeline from the command line.
+"""
+import os
+import time
+import uuid
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from utils import (load_json, save_json, load_results, save_results, results_lock,
+                   question_id, descriptive_marks, course_file, reload_questions_from_disk,
+                   ANSWER_INDEX_FILE)
+
+REGRADE_JOBS_DIR = "regrade_jobs"
+CHUNK = 256
+_GRADING_FIELDS = ("type", "correct", "answer_key", "max_marks")
+
+_QID_LOCKS = {}                # (course, question id) -> lock; one job per question
+_QID_LOCKS_GUARD = threading.Lock()
+
+
+def _workers() -> int:
+    try:
+        return max(1, int(os.getenv("REGRADE_WORKERS", "0")) or min(4, os.cpu_count() or 1))
+    except Exception:
+        return 1
+
+
+def _score_chunk(args):
+    """Process-pool task: similarity for one chunk of answers to one key."""
+    answers, answer_key = args
+    from grader import score_descriptive_batch, flush_stats
+    out = score_descriptive_batch(answers, answer_key)
+    flush_stats(force=True)     # pool processes exit without another chance
+    return out
+
+
+# ---- Job progress ----
+def _job_path(job_id):
+    return os.path.join(REGRADE_JOBS_DIR, f"{job_id}.json")
+
+def _write_job(job):
+    os.makedirs(REGRADE_JOBS_DIR, exist_ok=True)
+    save_json(_job_path(job["id"]), job)
+
+def get_job(job_id):
+    return load_json(_job_path(job_id)) or None
+
+def recent_jobs(limit=10, course=None):
+    if not os.path.isdir(REGRADE_JOBS_DIR):
+        return []
+    jobs = [load_json(os.path.join(REGRADE_JOBS_DIR, n))
+            for n in os.listdir(REGRADE_JOBS_DIR) if n.endswith(".json")]
+    jobs = [j for j in jobs if j and j.get("course") == course]
+    jobs.sort(key=lambda j: j.get("started", 0), reverse=True)
+    return jobs[:limit]
+
+
+# ---- Pipeline ----
+def _qid_lock(course, qid):
+    with _QID_LOCKS_GUARD:
+        return _QID_LOCKS.setdefault((course, qid), threading.Lock())
+
+def _superseded(question: dict, qid: str, course=None) -> bool:
+    """The bank's current version of the question no longer grades like `question`."""
+    for q in reload_questions_from_disk(course):
+        if question_id(q.q) == qid:
+            current = q.to_dict()
+            return any(current.get(f) != question.get(f) for f in _GRADING_FIELDS)
+    return True
+
+def _grade(question: dict, answers, job, workers):
+    """New (marks, similarity, grade, stage) per answer, in order."""
+    if question.get("type") == "MCQ":
+        correct = question.get("correct")
+        return [(1 if a and a == correct else 0, None, None, None) for a in answers]
+
+    key = question.get("answer_key", "")
+    max_marks = float(question.get("max_marks", 5))
+    chunks = [answers[i:i + CHUNK] for i in range(0, len(answers), CHUNK)]
+    scored = []
+    if workers > 1 and len(chunks) > 1:
+        try:
+            ctx = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=min(workers, len(chunks)), mp_context=ctx) as pool:
+                for part in pool.map(_score_chunk, [(c, key) for c in chunks]):
+                    scored.extend(part)
+                    job["graded"] = len(scored)
+                    _write_job(job)
+        except Exception as e:
+            print("[regrade] process pool failed, grading in-process:", e)
+            scored = []
+    if len(scored) < len(answers):
+        for c in chunks[len(scored) // CHUNK:]:
+            scored.extend(_score_chunk((c, key)))
+            job["graded"] = len(scored)
+            _write_job(job)
+
+    out = []
+    for ans, (sim, stage) in zip(answers, scored):
+        if not ans.strip():
+            out.append((0, 0, "Not Answered", None))
+        else:
+            marks, grade = descriptive_marks(sim, max_marks)
+            out.append((marks, sim, grade, stage))
+    return out
+
+
+def regrade_question(question: dict, job_id=None, workers=None, course=None) -> dict:
+    """
+    Re-grade every stored attempt in `course` that answered `question` (a
+    question dict with its NEW answer_key / max_marks / correct). Returns the
+    job record.
+    """
+    question = dict(question)
+    qid = question_id(question["q"])
+    job = {"id": job_id or uuid.uuid4().hex[:12], "qid": qid, "q": question["q"], "course": course,
+           "status": "running", "started": time.time(), "finished": None,
+           "attempts": 0, "graded": 0, "changed": 0, "error": None}
+    _write_job(job)
+    with _qid_lock(course, qid):
+        _run_job(question, qid, job, workers, course)
+    job["finished"] = time.time()
+    _write_job(job)
+    return job
+
+
+def _run_job(question, qid, job, workers, course=None):
+    try:
+        refs = load_json(course_file(ANSWER_INDEX_FILE, course)).get(qid, [])
+        results = load_results(course)
+        targets, answers = [], []
+        for username, pos in refs:
+            history = results.get(username, {}).get("history", [])
+            if pos >= len(history):
+                continue
+            for n, item in enumerate(history[pos].get("answers", [])):
+                if item.get("qid") == qid:
+                    targets.append((username, pos, n))
+                    answers.append(item.get("answer") or "")
+        job["attempts"] = len({(u, p) for u, p, _ in targets})
+        job["total"] = len(answers)
+        _write_job(job)
+
+        graded = _grade(question, answers, job, workers or _workers())
+        job["graded"] = len(graded)
+        new_max = 1 if question.get("type") == "MCQ" else float(question.get("max_marks", 5))
+
+        # ---- apply everything in one locked, atomic write ----
+        with results_lock(course):
+            if _superseded(question, qid, course):
+                job["status"] = "superseded"
+                print(f"[regrade] {job['id']}: question changed again, not applied")
+                return
+            results = load_results(course)
+            for (username, pos, n), (marks, sim, grade, stage) in zip(targets, graded):
+                entry = results[username]["history"][pos]
+                item = entry["answers"][n]
+                old_marks = item.get("marks", 0)
+                old_max = item.get("max", new_max)
+                if old_marks == marks and old_max == new_max:
+                    continue
+                item["marks"], item["max"] = marks, new_max
+                entry["score"] = round(float(entry.get("score", 0)) - old_marks + marks, 2)
+                entry["total"] = round(float(entry.get("total", 0)) - old_max + new_max, 2)
+                if sim is not None:
+                    for rep in entry.get("descriptive_reports") or []:
+                        if question_id(rep.get("q")) == qid:
+                            rep.update({"similarity": round(sim * 100, 2),
+                                        "originality": round(100 - sim * 100, 2),
+                                        "grade": grade, "marks": marks})
+                            if stage:
+                                rep["graded_by"] = stage
+                entry["regraded"] = time.strftime("%Y-%m-%d %H:%M:%S")
+                job["changed"] += 1
+            if job["changed"]:
+                save_results(results, course)
+        job["status"] = "done"
+    except Exception as e:
+        job["status"] = "failed"
+        job["error"] = str(e)
+        print("[regrade] failed:", e)
+
+
+def start_regrade(question: dict, course=None) -> str:
+    """Run regrade_question() in a background thread; returns the job id."""
+    job_id = uuid.uuid4().hex[:12]
+    threading.Thread(target=regrade_question, args=(question, job_id, None, course),
+                     name=f"regrade-{job_id}", daemon=True).start()
+    return job_id
@@ -0,0 +1,146 @@
+# results_export.py
+"""
+Streaming export of stored attempts (results.json history) as CSV or JSONL.
+
+export_rows() yields one attempt at a time, filtered by date range, a set of
+users and/or exam name. write_csv() / write_jsonl() turn that into text
+chunks of EXPORT_CHUNK rows, so the admin endpoints can hand them straight
+to a streaming (chunked) response and the CLI (export_results.py) to a file.
+Only the output is streamed: results.json itself is still read once, as
+everywhere else.
+
+CSV rows get one "Q<n> <question text...> marks" column per question seen
+in the filtered attempts (from the per-question "answers" stored since
+re-grading was added; n is the question's number in the course's bank, as
+on the admin dashboard); older attempts simply leave them empty. JSONL rows
+carry the full answers list, keyed by question id. Text cells that a
+spreadsheet would run as a formula (leading =, +, -, @) get a ' prefix.
+"""
+import io
+import csv
+import json
+
+from utils import load_results, load_questions, question_id
+
+EXPORT_CHUNK = 500          # rows per yielded text chunk
+LABEL_CHARS = 40            # question text kept in a CSV column header
+_FORMULA_CHARS = ("=", "+", "-", "@", "\t", "\r")
+
+BASE_COLUMNS = ["username", "date", "exam", "score", "total", "percent",
+                "time_taken", "auto_submitted", "regraded"]
+
+
+def _in_range(date: str, since=None, until=None) -> bool:
+    """since/until are "YYYY-MM-DD[ HH:MM[:SS]]" prefixes; both inclusive."""
+    if since and date < since:
+        return False
+    if until and date[:len(until)] > until:
+        return False
+    return True
+
+
+def export_rows(since=None, until=None, users=None, exam=None, course=None, results=None):
+    """Yield (username, entry) for every attempt of `course` matching the filters."""
+    results = load_results(course) if results is None else results
+    users = set(users) if users else None
+    for username in sorted(results):
+        if users is not None and username not in users:
+            continue
+        for entry in results[username].get("history", []):
+            if exam and entry.get("exam") != exam:
+                continue
+            if not _in_range(entry.get("date", ""), since, until):
+                continue
+            yield username, entry
+
+
+def _base_row(username, entry) -> dict:
+    score, total = entry.get("score", 0), entry.get("total", 0)
+    try:
+        percent = round(100.0 * float(score) / float(total), 2) if float(total) else 0.0
+    except (TypeError, ValueError):
+        percent = ""
+    return {
+        "username": username,
+        "date": entry.get("date", ""),
+        "exam": entry.get("exam", ""),
+        "score": score,
+        "total": total,
+        "percent": percent,
+        "time_taken": entry.get("time_taken", ""),
+        "auto_submitted": bool(entry.get("auto_submitted")),
+        "regraded": entry.get("regraded", ""),
+    }
+
+
+def _cell(value):
+    """Neutralise spreadsheet formulas in user-controlled text (usernames, questions)."""
+    if isinstance(value, str) and value.startswith(_FORMULA_CHARS):
+        return "'" + value
+    return value
+
+def _short(text: str) -> str:
+    text = " ".join(str(text or "").split())
+    return text if len(text) <= LABEL_CHARS else text[:LABEL_CHARS - 3] + "..."
+
+def _column_labels(qids, texts, course=None) -> dict:
+    """qid -> readable column header; questions no longer in the bank use their stored text."""
+    bank = {question_id(q.q): (n, q.q) for n, q in enumerate(load_questions(course), 1)}
+    labels = {}
+    for qid in qids:
+        if qid in bank:
+            n, text = bank[qid]
+            labels[qid] = f"Q{n} {_short(text)} marks"
+        else:
+            labels[qid] = f"{_short(texts.get(qid) or qid)} marks"
+    return labels
+
+
+def write_csv(**filters):
+    """Yield CSV text in chunks (header first)."""
+    results = filters.pop("results", None)
+    results = load_results(filters.get("course")) if results is None else results
+
+    # first pass: per-question columns (ids only, no rows kept)
+    qids, seen, texts = [], set(), {}
+    for _, entry in export_rows(results=results, **filters):
+        for item in entry.get("answers", []):
+            if item.get("qid") not in seen:
+                seen.add(item.get("qid"))
+                qids.append(item.get("qid"))
+        for rep in entry.get("descriptive_reports") or []:
+            texts.setdefault(question_id(rep.get("q")), rep.get("q"))
+    labels = _column_labels(qids, texts, filters.get("course"))
+
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(BASE_COLUMNS + [_cell(labels[q]) for q in qids])
+    rows = 0
+    for username, entry in export_rows(results=results, **filters):
+        base = _base_row(username, entry)
+        marks = {item.get("qid"): item.get("marks") for item in entry.get("answers", [])}
+        writer.writerow([_cell(base[c]) for c in BASE_COLUMNS] + [marks.get(q, "") for q in qids])
+        rows += 1
+        if rows % EXPORT_CHUNK == 0:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
+
+
+def write_jsonl(**filters):
+    """Yield JSON Lines text in chunks (one attempt per line)."""
+    lines = []
+    for username, entry in export_rows(**filters):
+        row = _base_row(username, entry)
+        row["answers"] = entry.get("answers", [])
+        row["descriptive_reports"] = entry.get("descriptive_reports", [])
+        lines.append(json.dumps(row, ensure_ascii=False))
+        if len(lines) >= EXPORT_CHUNK:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+WRITERS = {"csv": write_csv, "jsonl": write_jsonl}
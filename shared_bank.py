@@ -0,0 +1,180 @@
+# shared_bank.py
+"""
+Read-only, memory-mapped question bank shared by all gunicorn workers.
+
+One process publishes the migrated bank into a single file with a fixed
+layout; every worker mmaps it, so the OS page cache holds ONE copy no matter
+how many workers run. Publishing writes a new file and atomically renames it
+over the old one with generation + 1; workers notice the new inode on their
+next access and swap mappings (old mappings stay valid until dropped).
+
+Layout (little-endian):
+    header   "<4sHHQIIQ32s"  magic, version, reserved, generation, count,
+                             reserved (0), level_table_len, source_sha256
+    offsets  count * u64     byte offset of each record
+    lengths  count * u32     byte length of each record
+    types    count * u8      0 = MCQ, 1 = DESCRIPTIVE
+    levels   count * u8      index into the level table
+    level table              UTF-8 JSON list of level names
+    records                  UTF-8 JSON of Question.to_dict()
+"""
+import os
+import json
+import mmap
+import struct
+from array import array
+from collections.abc import Sequence
+
+from utils import Question, _tmp_path
+
+MAGIC = b"QBNK"
+VERSION = 1
+_HEADER = struct.Struct("<4sHHQIIQ32s")
+_TYPES = ("MCQ", "DESCRIPTIVE")
+
+
+def _read_generation(path: str) -> int:
+    try:
+        with open(path, "rb") as f:
+            head = f.read(_HEADER.size)
+        magic, version, _, gen, *_ = _HEADER.unpack(head)
+        return gen if magic == MAGIC else 0
+    except Exception:
+        return 0
+
+
+def publish_bank(questions, path: str, source_hash: str = "") -> int:
+    """
+    Write `questions` (Question records) to `path` in the shared layout.
+    Returns the new generation number.
+    """
+    count = len(questions)
+
+    levels = []
+    level_ids = {}
+    types = bytearray(count)
+    level_codes = bytearray(count)
+    records = []
+    for i, q in enumerate(questions):
+        types[i] = 0 if q.type == "MCQ" else 1
+        if q.level not in level_ids:
+            level_ids[q.level] = len(levels)
+            levels.append(q.level)
+        level_codes[i] = level_ids[q.level]
+        records.append(json.dumps(q.to_dict(), ensure_ascii=False).encode("utf-8"))
+    if len(levels) > 255:
+        raise ValueError("too many distinct levels for the shared bank")
+    level_table = json.dumps(levels).encode("utf-8")
+
+    data_start = _HEADER.size + count * 8 + count * 4 + count * 2 + len(level_table)
+    offsets = array("Q")
+    lengths = array("I")
+    pos = data_start
+    for rec in records:
+        offsets.append(pos)
+        lengths.append(len(rec))
+        pos += len(rec)
+
+    generation = _read_generation(path) + 1
+    digest = bytes.fromhex(source_hash) if source_hash else b"\0" * 32
+    header = _HEADER.pack(MAGIC, VERSION, 0, generation, count, 0,
+                          len(level_table), digest)
+
+    tmp = _tmp_path(path)
+    with open(tmp, "wb") as f:
+        f.write(header)
+        f.write(offsets.tobytes())
+        f.write(lengths.tobytes())
+        f.write(types)
+        f.write(level_codes)
+        f.write(level_table)
+        for rec in records:
+            f.write(rec)
+    os.replace(tmp, path)
+    return generation
+
+
+class SharedBank(Sequence):
+    """
+    Zero-copy, read-only view over a published bank file. Records are decoded
+    into Question objects on access; type/level filtering runs straight off
+    the mapped code arrays without decoding anything.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        buf = memoryview(self._mm)
+        (magic, version, _, self.generation, self.count, _,
+         level_len, digest) = _HEADER.unpack_from(buf, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path}: not a shared question bank")
+        self.source_hash = digest.hex() if digest.strip(b"\0") else ""
+
+        n = self.count
+        pos = _HEADER.size
+        self._offsets = buf[pos:pos + n * 8].cast("Q"); pos += n * 8
+        self._lengths = buf[pos:pos + n * 4].cast("I"); pos += n * 4
+        self._types = buf[pos:pos + n]; pos += n
+        self._levels = buf[pos:pos + n]; pos += n
+        self.levels = json.loads(bytes(buf[pos:pos + level_len]).decode("utf-8"))
+        self._buf = buf
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self.count))]
+        if i < 0:
+            i += self.count
+        if not 0 <= i < self.count:
+            raise IndexError(i)
+        off = self._offsets[i]
+        raw = bytes(self._buf[off:off + self._lengths[i]])
+        return Question.from_dict(json.loads(raw.decode("utf-8")))
+
+    def type_of(self, i: int) -> str:
+        return _TYPES[self._types[i]]
+
+    def level_of(self, i: int) -> str:
+        return self.levels[self._levels[i]]
+
+    def indices(self, qtype=None, level=None):
+        """Indices matching qtype ("MCQ"/"DESCRIPTIVE") and/or level, no decoding."""
+        tcode = _TYPES.index(qtype) if qtype in _TYPES else None
+        if level is not None and level not in self.levels:
+            return []
+        lcode = self.levels.index(level) if level is not None else None
+        types, lvls = self._types, self._levels
+        return [i for i in range(self.count)
+                if (tcode is None or types[i] == tcode)
+                and (lcode is None or lvls[i] == lcode)]
+
+
+# ---- Per-worker current mappings (one per bank file / course) ----
+_BANKS = {}    # path -> (stat key, SharedBank)
+
+
+def current_bank(path: str):
+    """
+    Return the mapping for `path`, remapping if it has been republished since
+    last call (one stat per call). None if the file doesn't exist / is invalid.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        _BANKS.pop(path, None)
+        return None
+    key = (st.st_ino, st.st_mtime_ns, st.st_size)
+    hit = _BANKS.get(path)
+    if hit is not None and hit[0] == key:
+        return hit[1]
+    try:
+        bank = SharedBank(path)
+    except Exception as e:
+        print("Warning: could not map shared question bank:", e)
+        return None
+    # pointer swap; the old mapping is released once nothing references it
+    _BANKS[path] = (key, bank)
+    return bank
@@ -0,0 +1,121 @@
+# similarity.py
+"""
+CPU inference backends for descriptive_similarity().
+
+    SIM_BACKEND     torch (default) | torch-int8 | onnx
+    SIM_MODEL_PATH  local model directory (nothing is downloaded when set);
+                    defaults to the hub name "all-MiniLM-L6-v2"
+    SIM_THREADS     intra-op threads per worker (default 1: gunicorn already
+                    runs one process per core, so more threads just contend)
+
+torch       sentence-transformers in full precision (previous behaviour).
+torch-int8  same model with torch dynamic int8 quantization of Linear layers.
+onnx        ONNX Runtime CPU session over <SIM_MODEL_PATH>/model.onnx with the
+            tokenizer files from the same directory; mean pooling as in
+            sentence-transformers. Export once with e.g.
+            `optimum-cli export onnx --model all-MiniLM-L6-v2 <dir>`.
+
+Every backend's encode() returns L2-normalised vectors, so cosine similarity
+is a plain dot product.
+
+Heavy libraries are imported only inside the backend constructors.
+"""
+import os
+import abc
+
+DEFAULT_MODEL = "all-MiniLM-L6-v2"
+
+
+def _threads() -> int:
+    try:
+        return max(1, int(os.getenv("SIM_THREADS", "1")))
+    except Exception:
+        return 1
+
+
+def cosine(u, v) -> float:
+    """Cosine of two already-normalised vectors."""
+    return sum(a * b for a, b in zip(u, v))
+
+
+class SimilarityBackend(abc.ABC):
+    name = "base"
+
+    @abc.abstractmethod
+    def encode(self, texts):
+        """List of L2-normalised embedding vectors, one per text."""
+
+
+class TorchBackend(SimilarityBackend):
+    name = "torch"
+
+    def __init__(self, model_path=None):
+        import torch
+        from sentence_transformers import SentenceTransformer
+        torch.set_num_threads(_threads())
+        local = model_path is not None
+        self.model = SentenceTransformer(model_path or DEFAULT_MODEL, device="cpu",
+                                         local_files_only=local)
+        self.model.eval()
+
+    def encode(self, texts):
+        vecs = self.model.encode(list(texts), normalize_embeddings=True,
+                                 convert_to_numpy=True, show_progress_bar=False)
+        return [v.tolist() for v in vecs]
+
+
+class QuantizedTorchBackend(TorchBackend):
+    name = "torch-int8"
+
+    def __init__(self, model_path=None):
+        super().__init__(model_path)
+        import torch
+        self.model = torch.quantization.quantize_dynamic(
+            self.model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+class OnnxBackend(SimilarityBackend):
+    name = "onnx"
+
+    def __init__(self, model_path=None):
+        if not model_path:
+            raise RuntimeError("onnx backend needs SIM_MODEL_PATH (dir with model.onnx + tokenizer)")
+        import numpy as np
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+        self._np = np
+        opts = ort.SessionOptions()
+        opts.intra_op_num_threads = _threads()
+        opts.inter_op_num_threads = 1
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(os.path.join(model_path, "model.onnx"), opts,
+                                            providers=["CPUExecutionProvider"])
+        self.tokenizer = AutoTokenizer.from_pretrained(model_path, local_files_only=True)
+        self._inputs = {i.name for i in self.session.get_inputs()}
+
+    def encode(self, texts):
+        np = self._np
+        enc = self.tokenizer(list(texts), padding=True, truncation=True,
+                             max_length=256, return_tensors="np")
+        feeds = {k: v.astype(np.int64) for k, v in enc.items() if k in self._inputs}
+        tokens = self.session.run(None, feeds)[0]              # (batch, seq, dim)
+        mask = enc["attention_mask"][..., None].astype(tokens.dtype)
+        pooled = (tokens * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return pooled.tolist()
+
+
+BACKENDS = {
+    TorchBackend.name: TorchBackend,
+    QuantizedTorchBackend.name: QuantizedTorchBackend,
+    OnnxBackend.name: OnnxBackend,
+}
+
+
+def load_backend(name=None, model_path=None) -> SimilarityBackend:
+    """Construct the configured backend (raises if its libraries are missing)."""
+    name = name or os.getenv("SIM_BACKEND", "torch")
+    model_path = model_path or os.getenv("SIM_MODEL_PATH") or None
+    if name not in BACKENDS:
+        raise ValueError(f"unknown SIM_BACKEND {name!r}; choose from {sorted(BACKENDS)}")
+    return BACKENDS[name](model_path)
@@ -3,12 +3,21 @@ import os
 import json
 import re
 import time
+import pickle
+import hashlib
+import sys
+import threading
+from contextlib import contextmanager
 from typing import List, Dict, Any
 
 # ---- Light-weight module-level constants (no heavy imports here) ----
 USERS_FILE = "users.json"
 RESULTS_FILE = "results.json"
 QUESTIONS_FILE = "questions.json"
+QUESTIONS_SNAPSHOT_FILE = "questions.snapshot.pkl"
+ANSWER_INDEX_FILE = "answer_index.json"
+SHARED_BANK_FILE = "questions.bank"
+COURSES_DIR = "courses"
 
 USERNAME_NO_SPACE = re.compile(r"^\S+$")
 
@@ -46,34 +55,31 @@ def _normalize_answer_key_text(key: str) -> str:
     parts = [p.strip() for p in re.split(r"[,\n;]+", k) if p.strip()]
     return " ".join(parts) if parts else k
 
-# ---- Lazy-loaded similarity model (do NOT import heavy libs at module import time) ----
-_SIM_MODEL = None
-_cosine_similarity = None
+# ---- Lazy-loaded similarity backend (do NOT import heavy libs at module import time) ----
+_SIM_BACKEND = None
 _similarity_model_loaded = False
 
 def ensure_similarity_model() -> bool:
     """
-    Load the sentence-transformers model on first use.
-    Returns True if model loaded successfully, False otherwise.
+    Load the configured similarity backend (see similarity.py: SIM_BACKEND,
+    SIM_MODEL_PATH, SIM_THREADS) on first use.
+    Returns True if it loaded successfully, False otherwise.
     """
-    global _SIM_MODEL, _cosine_similarity, _similarity_model_loaded
+    global _SIM_BACKEND, _similarity_model_loaded
     if _similarity_model_loaded:
-        return _SIM_MODEL is not None
+        return _SIM_BACKEND is not None
 
     _similarity_model_loaded = True
     try:
         # Import inside the function to avoid heavy startup cost
-        from sentence_transformers import SentenceTransformer
-        from sklearn.metrics.pairwise import cosine_similarity
-        _SIM_MODEL = SentenceTransformer("all-MiniLM-L6-v2")
-        _cosine_similarity = cosine_similarity
+        from similarity import load_backend
+        _SIM_BACKEND = load_backend()
         return True
     except Exception as e:
-        # Model not available — keep _SIM_MODEL = None
-        _SIM_MODEL = None
-        _cosine_similarity = None
+        # Backend not available — keep _SIM_BACKEND = None
+        _SIM_BACKEND = None
         # Print a friendly, non-fatal log so you can see why similarity won't run.
-        print("SentenceTransformer not available (deferred).", e)
+        print("Similarity backend not available (deferred).", e)
         return False
 
 def descriptive_similarity(student_answer: str, answer_key: str) -> float:
@@ -86,11 +92,126 @@ def descriptive_similarity(student_answer: str, answer_key: str) -> float:
         return 0.0
     if not ensure_similarity_model():
         return 0.0
+    from similarity import cosine
     model_text = _normalize_answer_key_text(answer_key)
-    vec = _SIM_MODEL.encode([student_answer, model_text])
-    score = _cosine_similarity([vec[0]], [vec[1]])[0][0]
+    vec = _SIM_BACKEND.encode([student_answer, model_text])
+    score = cosine(vec[0], vec[1])
     return max(0.0, min(1.0, float(score)))
 
+def similarity_batch(student_answers, answer_key: str) -> List[float]:
+    """
+    descriptive_similarity() for many answers to the same key, encoded in
+    one backend call (the key is encoded once). Used by bulk re-grading.
+    """
+    if not answer_key or not student_answers:
+        return [0.0] * len(student_answers)
+    if not ensure_similarity_model():
+        return [0.0] * len(student_answers)
+    from similarity import cosine
+    vecs = _SIM_BACKEND.encode([_normalize_answer_key_text(answer_key)] + list(student_answers))
+    key_vec = vecs[0]
+    return [max(0.0, min(1.0, float(cosine(v, key_vec)))) if a else 0.0
+            for a, v in zip(student_answers, vecs[1:])]
+
+# ---- Grading (shared by /result, the auto-submit sweeper and re-grading) ----
+def question_id(text: str) -> str:
+    """Stable id for a question, derived from its (whitespace-normalized) text."""
+    norm = " ".join(str(text or "").split()).lower()
+    return hashlib.sha1(norm.encode("utf-8")).hexdigest()[:12]
+
+def descriptive_marks(sim: float, max_marks: float):
+    """Map a similarity in [0, 1] to (marks, grade)."""
+    if sim >= 0.75:
+        marks = max_marks; grade = "Excellent"
+    elif sim >= 0.50:
+        marks = max_marks * 0.7; grade = "Good"
+    elif sim >= 0.30:
+        marks = max_marks * 0.4; grade = "Fair"
+    else:
+        marks = 0; grade = "Weak"
+    return round(marks, 2), grade
+
+def grade_answers(questions, answers) -> Dict[str, Any]:
+    """
+    Grade one attempt. `questions` are question dicts as stored in the
+    session, `answers` maps str(index) -> answer text.
+    Returns score / wrong / skipped / total / descriptive_reports, plus
+    `answers`: one {qid, type, answer, marks, max} per question, stored with the
+    attempt so it can be re-graded later.
+    """
+    answers = answers or {}
+    total = 0.0
+    score = 0.0
+    wrong = 0
+    skipped = 0
+    descriptive_reports = []
+    per_question = []
+
+    for i, q in enumerate(questions):
+        qtype = q.get("type", "MCQ")
+        ans = answers.get(str(i), "") or ""
+        item = {"qid": question_id(q["q"]), "type": qtype, "answer": ans, "marks": 0,
+                "max": 1 if qtype == "MCQ" else float(q.get("max_marks", 5))}
+        per_question.append(item)
+
+        # MCQ SCORING
+        if qtype == "MCQ":
+            total += 1
+            if not ans:
+                skipped += 1
+            elif ans == q.get("correct"):
+                score += 1
+                item["marks"] = 1
+            else:
+                wrong += 1
+
+        # DESCRIPTIVE SCORING
+        else:
+            max_marks = float(q.get("max_marks", 5))
+            total += max_marks
+
+            if not ans.strip():
+                skipped += 1
+                descriptive_reports.append({
+                    "q": q["q"],
+                    "similarity": 0,
+                    "originality": 100,
+                    "grade": "Not Answered",
+                    "marks": 0
+                })
+                continue
+
+            # lexical keyword coverage first; transformer only when ambiguous
+            from grader import score_descriptive
+            sim, stage = score_descriptive(ans, q.get("answer_key", ""))
+            s = sim * 100
+
+            marks, grade = descriptive_marks(sim, max_marks)
+            score += marks
+            item["marks"] = marks
+
+            descriptive_reports.append({
+                "q": q["q"],
+                "similarity": round(s, 2),
+                "originality": round(100 - s, 2),
+                "grade": grade,
+                "marks": marks,
+                "graded_by": stage
+            })
+
+    return {
+        "score": round(score, 2),
+        "wrong": wrong,
+        "skipped": skipped,
+        "total": total,
+        "descriptive_reports": descriptive_reports,
+        "answers": per_question,
+    }
+
+def format_duration(seconds) -> str:
+    t = int(seconds)
+    return f"{t//60}m {t%60}s"
+
 # ---- Question type and migration helpers ----
 def _fix_type_to_capital(item_type) -> str:
     if not item_type:
@@ -143,53 +264,425 @@ def _migrate_questions_list(qs) -> List[Dict[str,Any]]:
             out.append(fixed)
     return out
 
+# ---- Compact in-memory question ----
+class Question:
+    """
+    Slot-based question record used for the cached bank (one per question,
+    per worker). type/level/options/correct are interned so the thousands of
+    repeated "MCQ"/"Easy"/"True" strings are shared.
+
+    Supports the dict-style access the routes already use (q["level"],
+    q.get("type")), and templates read fields as attributes. Use to_dict()
+    at session / JSON boundaries.
+    """
+    __slots__ = ("q", "type", "level", "a", "correct", "answer_key", "max_marks")
+
+    _MCQ_FIELDS = ("q", "type", "a", "correct", "level")
+    _DESC_FIELDS = ("q", "type", "answer_key", "max_marks", "level")
+
+    def __init__(self, q, type, level, a=None, correct=None, answer_key=None, max_marks=None):
+        self.q = q
+        self.type = sys.intern(type)
+        self.level = sys.intern(level)
+        self.a = tuple(sys.intern(str(x)) for x in a) if a is not None else None
+        self.correct = sys.intern(correct) if correct is not None else None
+        self.answer_key = answer_key
+        self.max_marks = max_marks
+
+    def _fields(self):
+        return self._MCQ_FIELDS if self.type == "MCQ" else self._DESC_FIELDS
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "Question":
+        if d.get("type") == "MCQ":
+            return cls(d["q"], "MCQ", d.get("level") or "Easy",
+                       a=d.get("a") or (), correct=str(d.get("correct") or ""))
+        return cls(d["q"], "DESCRIPTIVE", d.get("level") or "Easy",
+                   answer_key=d.get("answer_key", ""), max_marks=d.get("max_marks", 5))
+
+    def to_dict(self) -> dict:
+        d = {k: getattr(self, k) for k in self._fields()}
+        if "a" in d:
+            d["a"] = list(d["a"])
+        return d
+
+    # dict-style access (kept so existing route code keeps working)
+    def get(self, key, default=None):
+        if key not in self._fields():
+            return default
+        return getattr(self, key)
+
+    def __getitem__(self, key):
+        if key not in self._fields():
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        if key in ("type", "level", "correct") and isinstance(value, str):
+            value = sys.intern(value)
+        setattr(self, key, value)
+
+    def __eq__(self, other):
+        if isinstance(other, Question):
+            return self.to_dict() == other.to_dict()
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    def __repr__(self):
+        return f"Question({self.to_dict()!r})"
+
+def as_question(item) -> "Question":
+    return item if isinstance(item, Question) else Question.from_dict(item)
+
+# ---- Course partitions ----
+# course=None is the default partition: the original files at the repo root.
+# Every other course keeps its own copy of each data file (and its own locks,
+# snapshot, shared bank and in-memory caches) under courses/<course>/, so one
+# course's traffic never reads, writes or invalidates another's.
+_COURSE_NAME = re.compile(r"^[A-Za-z0-9_-]{1,40}$")
+_COURSE_DIRS = set()
+
+def is_valid_course(course: str) -> bool:
+    return bool(course and _COURSE_NAME.match(course))
+
+def course_file(name: str, course=None) -> str:
+    """Path of data file `name` (e.g. RESULTS_FILE) for `course`."""
+    if not course:
+        return name
+    if not is_valid_course(course):
+        raise ValueError(f"invalid course name {course!r}")
+    folder = os.path.join(COURSES_DIR, course)
+    if course not in _COURSE_DIRS:
+        os.makedirs(folder, exist_ok=True)
+        _COURSE_DIRS.add(course)
+    return os.path.join(folder, name)
+
+def course_exists(course) -> bool:
+    return not course or (is_valid_course(course)
+                          and os.path.isdir(os.path.join(COURSES_DIR, course)))
+
+def list_courses() -> List[str]:
+    if not os.path.isdir(COURSES_DIR):
+        return []
+    return sorted(c for c in os.listdir(COURSES_DIR)
+                  if is_valid_course(c) and os.path.isdir(os.path.join(COURSES_DIR, c)))
+
 # ---- JSON helpers ----
 def _read_json(file):
     with open(file, "r", encoding="utf-8") as f:
         return json.load(f)
 
 def load_json(file):
+    empty = [] if os.path.basename(file) == QUESTIONS_FILE else {}
     if not os.path.exists(file):
-        return [] if file == QUESTIONS_FILE else {}
+        return empty
     try:
         return _read_json(file)
     except Exception:
-        return [] if file == QUESTIONS_FILE else {}
+        return empty
+
+def _tmp_path(path: str) -> str:
+    """Temp name unique per process AND thread (sweeper, re-grade jobs, dev server)."""
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
 
 def save_json(file, data):
-    with open(file, "w", encoding="utf-8") as f:
+    # write-then-rename so readers never see a half-written file
+    tmp = _tmp_path(file)
+    with open(tmp, "w", encoding="utf-8") as f:
         json.dump(data, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, file)
+    # The file's new mtime is the data version cached pages are keyed on;
+    # also evict pages rendered from it (only if the page cache is in use).
+    pc = sys.modules.get("page_cache")
+    if pc is not None:
+        pc.page_cache.invalidate_file(file)
 
 # ---- Public simple helpers ----
-def load_users(): return load_json(USERS_FILE)
-def save_users(x): save_json(USERS_FILE, x)
-def load_results(): return load_json(RESULTS_FILE)
-def save_results(x): save_json(RESULTS_FILE, x)
-
-# ---- Cached questions loader (lazy + cached) ----
-_QUESTIONS_CACHE: List[Dict[str,Any]] | None = None
-_QUESTIONS_CACHE_ATIME: float | None = None
-
-def _load_questions_from_disk():
-    global _QUESTIONS_CACHE, _QUESTIONS_CACHE_ATIME
-    raw = load_json(QUESTIONS_FILE)
-    migrated = _migrate_questions_list(raw if isinstance(raw, list) else [])
-    _QUESTIONS_CACHE = migrated
-    _QUESTIONS_CACHE_ATIME = time.time()
-    return _QUESTIONS_CACHE
-
-def load_questions():
-    """
-    Public API: returns cached questions list, loading/migrating once on first call.
+def load_users(course=None): return load_json(course_file(USERS_FILE, course))
+def save_users(x, course=None): save_json(course_file(USERS_FILE, course), x)
+def load_results(course=None): return load_json(course_file(RESULTS_FILE, course))
+def save_results(x, course=None): save_json(course_file(RESULTS_FILE, course), x)
+
+@contextmanager
+def file_lock(path: str):
+    """
+    Cross-process lock (flock on `path`.lock) around a read-modify-write of
+    `path`. No-op where fcntl is unavailable (Windows dev boxes).
+    """
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+    with open(path + ".lock", "a") as lf:
+        fcntl.flock(lf, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lf, fcntl.LOCK_UN)
+
+def results_lock(course=None):
+    """file_lock() for a course's results.json (and its answer index)."""
+    return file_lock(course_file(RESULTS_FILE, course))
+
+def append_history(username: str, entry: dict, course=None):
+    """Append one finished attempt to the user's history in results.json."""
+    with results_lock(course):
+        results = load_results(course)
+        if username not in results:
+            results[username] = {"history": []}
+        history = results[username].setdefault("history", [])
+        history.append(entry)
+        save_results(results, course)
+        if entry.get("answers"):
+            index_file = course_file(ANSWER_INDEX_FILE, course)
+            index = load_json(index_file)
+            _index_entry(index, username, len(history) - 1, entry)
+            save_json(index_file, index)
+
+# ---- Answer index: question id -> attempts that answered it ----
+def _index_entry(index: dict, username: str, pos: int, entry: dict):
+    for qid in {a["qid"] for a in entry.get("answers", [])}:
+        index.setdefault(qid, []).append([username, pos])
+
+def rebuild_answer_index(course=None) -> dict:
+    """Rebuild answer_index.json from results.json (one full scan)."""
+    with results_lock(course):
+        index = {}
+        for username, info in load_results(course).items():
+            for pos, entry in enumerate(info.get("history", [])):
+                _index_entry(index, username, pos, entry)
+        save_json(course_file(ANSWER_INDEX_FILE, course), index)
+    return index
+
+# ---- Cached questions loader (lazy + cached, one entry per course) ----
+_QUESTIONS_CACHE: Dict[Any, List[Question]] = {}
+_QUESTIONS_CACHE_ATIME: Dict[Any, float] = {}
+
+# ---- Pre-migrated question-bank snapshot ----
+# Pickled, already-migrated bank stored as compact tuples plus the hash of the
+# questions.json it was built from. Loading it is one read + unpickle; the full
+# JSON parse + migration only runs when the source has changed.
+_SNAPSHOT_VERSION = 1
+
+def _question_to_row(q: Question) -> tuple:
+    if q.type == "MCQ":
+        return ("MCQ", q.q, q.level, q.a, q.correct)
+    return ("DESCRIPTIVE", q.q, q.level, q.answer_key, q.max_marks)
+
+def _row_to_question(row: tuple) -> Question:
+    qtype, text, level, x, y = row
+    if qtype == "MCQ":
+        return Question(text, "MCQ", level, a=x, correct=y)
+    return Question(text, "DESCRIPTIVE", level, answer_key=x, max_marks=y)
+
+def _source_fingerprint(path: str):
+    """(size, mtime_ns) of the source file, or None if it is missing."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_size, st.st_mtime_ns)
+
+def _hash_file(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def write_questions_snapshot(questions, source: str = QUESTIONS_FILE,
+                             snapshot: str = QUESTIONS_SNAPSHOT_FILE) -> bool:
+    """
+    Write the snapshot for an already-migrated questions list, tagged with the
+    current hash of `source`. Returns False (non-fatal) if it couldn't be written.
+    """
+    fp = _source_fingerprint(source)
+    if fp is None:
+        return False
+    payload = {
+        "version": _SNAPSHOT_VERSION,
+        "source_hash": _hash_file(source),
+        "source_stat": fp,
+        "rows": [_question_to_row(q) for q in questions],
+    }
+    return _write_snapshot(payload, snapshot)
+
+def _write_snapshot(payload: dict, snapshot: str) -> bool:
+    tmp = _tmp_path(snapshot)
+    try:
+        with open(tmp, "wb") as f:
+            pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, snapshot)
+        return True
+    except Exception as e:
+        print("Warning: could not write questions snapshot:", e)
+        return False
+
+def _read_questions_snapshot(source: str = QUESTIONS_FILE,
+                             snapshot: str = QUESTIONS_SNAPSHOT_FILE):
+    """
+    Return the migrated questions from the snapshot if it matches `source`,
+    else None. Same size+mtime is trusted; otherwise the content hash decides.
+    """
+    fp = _source_fingerprint(source)
+    if fp is None or not os.path.exists(snapshot):
+        return None
+    try:
+        with open(snapshot, "rb") as f:
+            payload = pickle.load(f)
+    except Exception:
+        return None
+    if not isinstance(payload, dict) or payload.get("version") != _SNAPSHOT_VERSION:
+        return None
+    if tuple(payload.get("source_stat") or ()) != fp:
+        if payload.get("source_hash") != _hash_file(source):
+            return None
+        # same content, new mtime (touch / checkout): remember the new stat
+        # so the next start trusts it without hashing again
+        payload["source_stat"] = fp
+        _write_snapshot(payload, snapshot)
+    return [_row_to_question(r) for r in payload.get("rows", [])]
+
+def _read_questions_from_disk(course=None):
+    """Migrated questions of `course` from its snapshot / questions.json (not cached)."""
+    source = course_file(QUESTIONS_FILE, course)
+    snapshot = course_file(QUESTIONS_SNAPSHOT_FILE, course)
+    migrated = _read_questions_snapshot(source, snapshot)
+    if migrated is None:
+        raw = load_json(source)
+        migrated = [Question.from_dict(d) for d in
+                    _migrate_questions_list(raw if isinstance(raw, list) else [])]
+        write_questions_snapshot(migrated, source, snapshot)
+    return migrated
+
+def _load_questions_from_disk(course=None):
+    migrated = _read_questions_from_disk(course)
+    _QUESTIONS_CACHE[course] = migrated
+    _QUESTIONS_CACHE_ATIME[course] = time.time()
+    return migrated
+
+# ---- Optional shared (mmap) bank across workers ----
+def shared_bank_enabled() -> bool:
+    return os.getenv("SHARED_BANK") == "1"
+
+_SHARED_BANK_CHECKED: Dict[Any, int] = {}   # course -> generation whose source hash we verified
+
+def _load_shared_bank(course=None):
+    """
+    Map the course's shared bank file, (re)publishing it first if it is missing
+    or was built from a different questions.json. The list it is published
+    from is dropped afterwards, so no worker keeps a private copy; only if
+    publishing fails does it fall back to the per-process cache.
+    """
+    import shared_bank
+    source = course_file(QUESTIONS_FILE, course)
+    bank_file = course_file(SHARED_BANK_FILE, course)
+    bank = shared_bank.current_bank(bank_file)
+    if bank is not None and (bank.generation == _SHARED_BANK_CHECKED.get(course)
+                             or not os.path.exists(source)):
+        return bank
+    src_hash = _hash_file(source) if os.path.exists(source) else ""
+    if bank is None or bank.source_hash != src_hash:
+        qs = _read_questions_from_disk(course)
+        try:
+            shared_bank.publish_bank(qs, bank_file, src_hash)
+        except Exception as e:
+            print("Warning: could not publish shared question bank:", e)
+            return _cache_fallback(qs, course)
+        bank = shared_bank.current_bank(bank_file)
+        if bank is None:
+            return _cache_fallback(qs, course)
+        _QUESTIONS_CACHE.pop(course, None)
+    _SHARED_BANK_CHECKED[course] = bank.generation
+    return bank
+
+def _cache_fallback(qs, course=None):
+    _QUESTIONS_CACHE[course] = qs
+    _QUESTIONS_CACHE_ATIME[course] = time.time()
+    return qs
+
+def load_questions(course=None):
+    """
+    Public API: returns cached list of Question records for `course` (None =
+    default bank), loading/migrating once on first call.
+    With SHARED_BANK=1 returns a read-only, memory-mapped SharedBank instead.
     Use reload_questions_from_disk() to force a refresh.
     """
-    global _QUESTIONS_CACHE
-    if _QUESTIONS_CACHE is not None:
-        return _QUESTIONS_CACHE
-    return _load_questions_from_disk()
+    if shared_bank_enabled():
+        return _load_shared_bank(course)
+    qs = _QUESTIONS_CACHE.get(course)
+    if qs is not None:
+        return qs
+    return _load_questions_from_disk(course)
+
+def load_questions_for_edit(course=None):
+    """
+    Mutable question list for admin edits; pass it back to save_questions().
+    (The shared bank is read-only, so it is copied out.)
+    """
+    qs = load_questions(course)
+    return qs if isinstance(qs, list) else list(qs)
+
+def filter_question_ids(questions, qtype=None, level=None):
+    """
+    Indices of questions matching qtype/level (None = any). Uses the shared
+    bank's code arrays when available so nothing is decoded.
+    """
+    if hasattr(questions, "indices"):
+        return questions.indices(qtype, level)
+    return [i for i, q in enumerate(questions)
+            if (qtype is None or q.type == qtype)
+            and (level is None or q.level == level)]
+
+def reload_questions_from_disk(course=None):
+    """
+    Force reload of a course's questions from disk and update its cache.
+    With SHARED_BANK=1 the mapped bank is re-checked against questions.json
+    (and republished if it is stale) instead, so no private copy is kept.
+    """
+    if shared_bank_enabled():
+        _SHARED_BANK_CHECKED.pop(course, None)
+        return _load_shared_bank(course)
+    return _load_questions_from_disk(course)
+
+def save_questions(questions, course=None):
+    """
+    Persist a course's question bank (admin edits / AI generation) and refresh
+    its snapshot so the next process start loads it without re-migrating.
+    """
+    # routes may append plain dicts; compact them before caching
+    questions[:] = [as_question(q) for q in questions]
+    source = course_file(QUESTIONS_FILE, course)
+    save_json(source, [q.to_dict() for q in questions])
+    write_questions_snapshot(questions, source, course_file(QUESTIONS_SNAPSHOT_FILE, course))
+    if shared_bank_enabled():
+        # workers read the published bank; don't keep the edited list around
+        import shared_bank
+        try:
+            _SHARED_BANK_CHECKED[course] = shared_bank.publish_bank(
+                questions, course_file(SHARED_BANK_FILE, course), _hash_file(source))
+            _QUESTIONS_CACHE.pop(course, None)
+            return
+        except Exception as e:
+            print("Warning: could not publish shared question bank:", e)
+    _QUESTIONS_CACHE[course] = questions
+    _QUESTIONS_CACHE_ATIME[course] = time.time()
 
-def reload_questions_from_disk():
+def migrate_questions_file(path: str = QUESTIONS_FILE):
     """
-    Force reload of questions from disk and update cache.
+    Offline step: rewrite the question bank in fully-migrated form so that
+    workers don't have anything left to fix at startup.
+    Returns (items_before, items_after).
     """
-    return _load_questions_from_disk()
+    raw = load_json(path)
+    raw = raw if isinstance(raw, list) else []
+    migrated = _migrate_questions_list(raw)
+    save_json(path, migrated)
+    if os.path.basename(path) == QUESTIONS_FILE:
+        write_questions_snapshot([Question.from_dict(d) for d in migrated], path,
+                                 os.path.join(os.path.dirname(path), QUESTIONS_SNAPSHOT_FILE))
+    return len(raw), len(migrated)